@@ -2,74 +2,274 @@
 Code Understanding Agent - Analyzes PR code changes to identify issues and summarize changes
 """
 
-import json
-from typing import Dict, Any
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate
+import asyncio
+import logging
+import os
+from typing import Dict, Any, List, Optional
+import orjson
 from langchain_core.tools import BaseTool, ToolException
 from langchain_core.callbacks.manager import CallbackManagerForToolRun
 
+from src.agents.pr_retriever import parse_diff
+from src.cache.llm_cache import cached_invoke
+from src.tools.llm_tools import (
+    DEFAULT_ESCALATION_POLICY,
+    EscalationPolicy,
+    build_review_prompt,
+    format_review_messages,
+    get_model,
+    parse_json_response,
+)
+
+logger = logging.getLogger(__name__)
+
+# The summary and the issue scan are independent, so they are requested as
+# two separate prompts and run concurrently
+_SUMMARY_PROMPT = build_review_prompt("""You are the Code Understanding Agent.
+Analyze the PR data and provide a concise summary of the changes.
+Respond in the SUMMARY format.""")
+
+_ISSUES_PROMPT = build_review_prompt("""You are the Code Understanding Agent.
+Analyze the PR data and identify:
+1. Any risky or poor coding practices
+2. Code quality issues
+Respond in the ISSUES format.""")
+
+# Diffs at least this long (in characters) are analyzed one file at a time
+ANALYSIS_CHUNK_MIN_CHARS = int(os.getenv("ANALYSIS_CHUNK_MIN_CHARS", "20000"))
+
+# Maximum number of per-file analyses in flight for one PR
+_FILE_ANALYSIS_CONCURRENCY = 8
+
+_FILE_ANALYSIS_PROMPT = build_review_prompt("""You are the Code Understanding Agent.
+The PR data contains the changes to a single file of a larger PR.
+Analyze them and identify:
+1. A concise summary of the changes to this file
+2. Any risky or poor coding practices
+3. Code quality issues
+Respond in the FILE_ANALYSIS format.""")
+
+_SUMMARY_REDUCE_PROMPT = build_review_prompt("""You are the Code Understanding Agent.
+The changes of the PR were summarized file by file below.
+Combine the per-file summaries into a concise summary of the whole PR.
+Respond in the SUMMARY format.
+
+Per-file summaries:
+{file_summaries}""")
+
 class CodeAnalysisTool(BaseTool):
     """Tool for analyzing code changes in a PR."""
     
     name: str = "code_analysis_tool"
     description: str = "Analyzes code changes in a PR to identify issues and summarize changes"
     
-    model_name: str = "openai:gpt-4.1"
+    escalation_policy: EscalationPolicy = DEFAULT_ESCALATION_POLICY
     
     def _run(self, *args, **kwargs) -> str:
         """Synchronous run method required by BaseTool."""
         raise NotImplementedError("This tool only supports async execution.")
     
-    async def _arun(self, pr_data: str, run_manager: CallbackManagerForToolRun = None) -> str:
+    async def _arun(self, pr_data: str, diff_parsed: Optional[Dict[str, Any]] = None,
+                    file_analyses: Optional[List[Dict[str, str]]] = None,
+                    run_manager: CallbackManagerForToolRun = None) -> str:
         """Run the tool asynchronously."""
         try:
-            # Initialize LLM
-            model = init_chat_model(self.model_name)
+            # The fast model does the first pass, unless the graph already ran
+            # it file by file; the strong model redoes a result only if it did
+            # not parse or flags many risky practices
+            policy = self.escalation_policy
+            pr = parse_json_response(pr_data)
+            if not file_analyses:
+                file_data = self.file_data(pr, diff_parsed)
+                if len(file_data) > 1:
+                    file_analyses = await self._analyze_files(policy.fast_model, file_data)
+            if file_analyses:
+                # The policy applies to each file, so only the files that trip
+                # it are redone and the others keep their fast-model analysis
+                file_analyses = await self._escalate_files(pr, diff_parsed, file_analyses)
+                return await self.reduce_file_analyses(pr or {}, file_analyses)
             
-            # Create system message
-            system_message = SystemMessage(
-                content="You are the Code Understanding Agent. Your task is to analyze code changes in a PR and identify potential issues."
-            )
-            
-            # Create prompt for code analysis
-            prompt_template = ChatPromptTemplate.from_messages([
-                system_message,
-                HumanMessage(content=f"""
-                Analyze the following PR data and provide:
-                1. A summary of the changes
-                2. Identification of any risky or poor coding practices
-                3. Code quality issues
-                
-                Format your response as a structured JSON with these fields:
-                - summary: A concise summary of the changes
-                - risky_practices: List of objects with 'file', 'line', and 'description' fields
-                - code_quality_issues: List of objects with 'file', 'line', and 'description' fields
-                
-                PR Data:
-                {pr_data}
-                """)
-            ])
-            
-            # Get analysis from the LLM
-            response = await model.ainvoke(prompt_template.format_messages())
-            return response.content
+            code_analysis = await self._analyze(policy.fast_model, pr_data)
+            analysis = parse_json_response(code_analysis)
+            risky_count = len(analysis.get("risky_practices") or []) if analysis else 0
+            if policy.should_escalate(analysis, risky_count):
+                logger.info("Escalating code analysis to %s", policy.strong_model)
+                code_analysis = await self._analyze(policy.strong_model, pr_data)
+            return code_analysis
             
         except Exception as e:
             raise ToolException(f"Error analyzing code changes: {str(e)}")
+    
+    async def _analyze(self, model_name: str, pr_data: str) -> str:
+        """Analyze the whole PR with the given model."""
+        # Get the (cached) LLM
+        model = get_model(model_name)
+        
+        summary_messages = format_review_messages(_SUMMARY_PROMPT, model_name, pr_data=pr_data)
+        issues_messages = format_review_messages(_ISSUES_PROMPT, model_name, pr_data=pr_data)
+        
+        # Get both parts of the analysis from the LLM
+        summary_text, issues_text = await asyncio.gather(
+            cached_invoke(model, summary_messages, json_mode=True),
+            cached_invoke(model, issues_messages, json_mode=True)
+        )
+        return self._merge_analysis(summary_text, issues_text)
+    
+    def file_data(self, pr: Optional[Dict[str, Any]],
+                  diff_parsed: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Split a PR whose diff is large enough into the data of each changed file.
+        
+        Args:
+            pr: The parsed PR data
+            diff_parsed: The retriever's parse of the diff, if there is one
+            
+        Returns:
+            One entry per file with the PR overview, the file and its diff
+            section; empty if the diff is analyzed as a whole
+        """
+        diff = pr.get("diff") if pr else None
+        if not isinstance(diff, str) or len(diff) < ANALYSIS_CHUNK_MIN_CHARS:
+            return []
+        # Reuse the retriever's parse of the diff when there is one
+        if not diff_parsed:
+            diff_parsed = parse_diff(diff)
+        
+        overview = {"title": pr.get("title"), "description": pr.get("description")}
+        files = {
+            file["filename"]: file
+            for file in pr.get("files_changed") or []
+            if isinstance(file, dict) and "filename" in file
+        }
+        return [
+            {**overview, "file": files.get(path, {"filename": path}), "diff": diff[start:end]}
+            for path, (start, end) in zip(diff_parsed["files"], diff_parsed["spans"])
+        ]
+    
+    async def analyze_file(self, model_name: str, file_data: Dict[str, Any]) -> Dict[str, str]:
+        """Analyze the changes to a single file.
+        
+        Args:
+            model_name: The name of the LLM model to use
+            file_data: One entry of ``file_data``
+            
+        Returns:
+            The file's path and the raw analysis response
+        """
+        messages = format_review_messages(_FILE_ANALYSIS_PROMPT, model_name, pr_data=orjson.dumps(file_data).decode())
+        analysis = await cached_invoke(get_model(model_name), messages, json_mode=True)
+        return {"file": file_data["file"]["filename"], "analysis": analysis}
+    
+    async def _analyze_files(self, model_name: str, file_data: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Analyze the given files concurrently with the given model."""
+        semaphore = asyncio.Semaphore(_FILE_ANALYSIS_CONCURRENCY)
+        
+        async def analyze_file(data: Dict[str, Any]) -> Dict[str, str]:
+            async with semaphore:
+                return await self.analyze_file(model_name, data)
+        
+        return list(await asyncio.gather(*(analyze_file(data) for data in file_data)))
+    
+    async def _escalate_files(self, pr: Optional[Dict[str, Any]], diff_parsed: Optional[Dict[str, Any]],
+                              file_analyses: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Redo with the strong model the per-file analyses that trip the escalation policy.
+        
+        Args:
+            pr: The parsed PR data
+            diff_parsed: The retriever's parse of the diff, if there is one
+            file_analyses: The fast-model results of ``analyze_file``
+            
+        Returns:
+            The per-file analyses, with the escalated files replaced
+        """
+        policy = self.escalation_policy
+        escalated = []
+        for index, file_analysis in enumerate(file_analyses):
+            analysis = parse_json_response(file_analysis["analysis"])
+            risky_count = len(analysis.get("risky_practices") or []) if analysis else 0
+            if policy.should_escalate(analysis, risky_count):
+                escalated.append(index)
+        if not escalated:
+            return file_analyses
+        
+        file_data = {data["file"]["filename"]: data for data in self.file_data(pr, diff_parsed)}
+        escalated = [index for index in escalated if file_analyses[index]["file"] in file_data]
+        logger.info("Escalating the analysis of %d file(s) to %s", len(escalated), policy.strong_model)
+        redone = await self._analyze_files(
+            policy.strong_model, [file_data[file_analyses[index]["file"]] for index in escalated]
+        )
+        file_analyses = list(file_analyses)
+        for index, file_analysis in zip(escalated, redone):
+            file_analyses[index] = file_analysis
+        return file_analyses
+    
+    async def reduce_file_analyses(self, pr: Dict[str, Any], file_analyses: List[Dict[str, str]]) -> str:
+        """Reduce the per-file analyses of a PR into one analysis document.
+        
+        Args:
+            pr: The parsed PR data
+            file_analyses: The results of ``analyze_file``
+            
+        Returns:
+            The analysis document
+        """
+        file_summaries = []
+        risky_practices = []
+        code_quality_issues = []
+        for file_analysis in file_analyses:
+            path, response = file_analysis["file"], file_analysis["analysis"]
+            analysis = parse_json_response(response)
+            if analysis is None:
+                file_summaries.append(f"- {path}: {response}")
+                continue
+            file_summaries.append(f"- {path}: {analysis.get('summary', '')}")
+            risky_practices.extend(analysis.get("risky_practices") or [])
+            code_quality_issues.extend(analysis.get("code_quality_issues") or [])
+        
+        # The fast model is enough to combine the per-file summaries
+        reducer_model_name = self.escalation_policy.fast_model
+        overview_data = orjson.dumps({
+            "title": pr.get("title"),
+            "description": pr.get("description"),
+            "files_changed": pr.get("files_changed")
+        }).decode()
+        messages = format_review_messages(
+            _SUMMARY_REDUCE_PROMPT, reducer_model_name,
+            pr_data=overview_data, file_summaries="\n".join(file_summaries)
+        )
+        summary_text = await cached_invoke(get_model(reducer_model_name), messages, json_mode=True)
+        summary = parse_json_response(summary_text)
+        
+        return orjson.dumps({
+            "summary": summary.get("summary", "") if summary else summary_text,
+            "risky_practices": risky_practices,
+            "code_quality_issues": code_quality_issues
+        }).decode()
+    
+    def _merge_analysis(self, summary_text: str, issues_text: str) -> str:
+        """Combine the summary and issue responses into one analysis document."""
+        summary = parse_json_response(summary_text)
+        issues = parse_json_response(issues_text)
+        if summary is None or issues is None:
+            # Keep the raw responses so downstream agents still see the analysis
+            return f"{summary_text}\n\n{issues_text}"
+        
+        return orjson.dumps({
+            "summary": summary.get("summary", ""),
+            "risky_practices": issues.get("risky_practices", []),
+            "code_quality_issues": issues.get("code_quality_issues", [])
+        }).decode()
 
 class CodeUnderstandingAgent:
     """Agent that analyzes code changes using an LLM"""
     
-    def __init__(self, model_name: str = "openai:gpt-4.1"):
+    def __init__(self, escalation_policy: EscalationPolicy = DEFAULT_ESCALATION_POLICY):
         """Initialize the Code Understanding Agent.
         
         Args:
-            model_name: The name of the LLM model to use
+            escalation_policy: The fast/strong model routing to use
         """
-        self.model_name = model_name
-        self.analysis_tool = CodeAnalysisTool(model_name=model_name)
+        self.escalation_policy = escalation_policy
+        self.analysis_tool = CodeAnalysisTool(escalation_policy=escalation_policy)
     
     async def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Run the Code Understanding Agent.
@@ -80,7 +280,7 @@ class CodeUnderstandingAgent:
         Returns:
             Updated workflow state with code analysis
         """
-        print("Running Code Understanding Agent...")
+        logger.info("Running Code Understanding Agent...")
         
         try:
             # Check if we have PR data
@@ -89,28 +289,59 @@ class CodeUnderstandingAgent:
                 return state
             
             # Analyze the code changes
-            code_analysis = await self.analysis_tool._arun(state["pr_data"])
+            # For large diffs the graph has already analyzed each file
+            code_analysis = await self.analysis_tool._arun(
+                state["pr_data"], state.get("diff_parsed"), state.get("file_analyses")
+            )
             
             # Update the state with code analysis
             state["code_analysis"] = code_analysis
             
-            # Try to parse the analysis to extract key metrics
-            try:
-                analysis_json = json.loads(code_analysis)
+            # Extract key metrics from the analysis; if it does not parse,
+            # just continue without them
+            analysis_json = parse_json_response(code_analysis)
+            if analysis_json:
                 if "summary" in analysis_json:
                     state["analysis_summary"] = analysis_json["summary"]
                 if "risky_practices" in analysis_json:
                     state["risky_practices_count"] = len(analysis_json["risky_practices"])
                 if "code_quality_issues" in analysis_json:
                     state["quality_issues_count"] = len(analysis_json["code_quality_issues"])
-            except json.JSONDecodeError:
-                # If parsing fails, just continue without the extra metrics
-                pass
                 
-            print("Code analysis completed successfully")
+            logger.info("Code analysis completed successfully")
             return state
             
         except Exception as e:
-            print(f"Error in Code Understanding Agent: {str(e)}")
+            logger.error("Error in Code Understanding Agent: %s", e)
             state["error"] = f"Error in Code Understanding Agent: {str(e)}"
             return state
+    
+    def file_data(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Get the per-file data of a PR whose diff is large enough to be analyzed file by file.
+        
+        Args:
+            state: The current workflow state
+            
+        Returns:
+            One entry per changed file, or an empty list if the diff is analyzed as a whole
+        """
+        if not state.get("pr_data"):
+            return []
+        file_data = self.analysis_tool.file_data(parse_json_response(state["pr_data"]), state.get("diff_parsed"))
+        return file_data if len(file_data) > 1 else []
+    
+    async def run_file(self, file_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Analyze a single file of a large PR with the fast model.
+        
+        Args:
+            file_data: One entry of ``file_data``
+            
+        Returns:
+            State update appending the file's analysis
+        """
+        try:
+            file_analysis = await self.analysis_tool.analyze_file(self.escalation_policy.fast_model, file_data)
+            return {"file_analyses": [file_analysis]}
+        except Exception as e:
+            logger.error("Error analyzing %s: %s", file_data["file"].get("filename"), e)
+            return {"error": f"Error in Code Understanding Agent: {str(e)}"}
@@ -2,14 +2,109 @@
 PR Retriever Agent - Fetches metadata of PRs using GitHub API via MCP
 """
 
-import json
-from typing import Dict, Any, List
-from pydantic import BaseModel
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate
+import logging
+import os
+import re
+from typing import Dict, Any, List, Optional, Tuple
+import orjson
 
-from src.tools.github_tools import get_github_tools
+from src.tools.github_tools import fetch_pr_bundle
+
+logger = logging.getLogger(__name__)
+
+# Keys of each changed-file entry that are useful to the reviewers; the
+# per-file patch is dropped since the full diff is already part of the PR data
+_FILE_KEYS = ("filename", "status", "additions", "deletions")
+
+# Test fixtures and snapshots, whose content is noise to the reviewers
+_FIXTURE_PATH_RE = re.compile(r'(^|/)(fixtures?|__snapshots__|testdata)/|\.snap$')
+
+# Generated files, whose diff is noise to the reviewers; lock files are
+# matched separately by _LOCKFILE_RE
+_GENERATED_PATH_RE = re.compile(r'\.min\.(js|css)$|_pb2?\.py$|\.pb\.(go|cc|h)$|_pb\.go$')
+
+# Start of each file's section in a unified diff
+_DIFF_FILE_RE = re.compile(r'^(?=diff --git )', re.MULTILINE)
+
+# Hunk header of a unified diff, capturing the old and new start lines
+_HUNK_HEADER_RE = re.compile(r'^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@', re.MULTILINE)
+
+# PRs adding fewer lines than this skip the LLM review stages
+TRIVIAL_PR_MAX_ADDITIONS = int(os.getenv("TRIVIAL_PR_MAX_ADDITIONS", "10"))
+
+_DOC_EXTENSIONS = (".md", ".rst", ".txt")
+
+# Documentation files without a documentation extension, e.g. LICENSE
+_DOC_NAME_RE = re.compile(r'(^|/)(LICENSE|LICENCE|CHANGELOG|AUTHORS|NOTICE)$')
+
+# Dependency lock files, which are generated rather than written by hand
+_LOCKFILE_RE = re.compile(r'(^|/)([^/]+\.lock|package-lock\.json|pnpm-lock\.yaml|go\.sum)$')
+
+TRIVIAL_REVIEW_TEMPLATE = """# PR Review: {title}
+
+## Overview
+- **PR:** #{pr_number}
+- **Author:** {author}
+- **Files changed:** {files_changed}
+
+## Overall Assessment
+**Approve** - LGTM, trivial change ({reason}); the detailed review was skipped.
+"""
+
+def split_diff(diff: str) -> List[Tuple[Optional[str], str]]:
+    """Split a unified diff into per-file sections.
+    
+    Args:
+        diff: The unified diff
+        
+    Returns:
+        (path, section) pairs in diff order; text before the first file
+        section, if any, is returned with a path of None
+    """
+    sections = []
+    for section in _DIFF_FILE_RE.split(diff):
+        if section.startswith("diff --git "):
+            sections.append((section.split("\n", 1)[0].rsplit(" b/", 1)[-1], section))
+        elif section:
+            sections.append((None, section))
+    return sections
+
+def parse_diff(diff: str) -> Dict[str, List[Any]]:
+    """Parse a unified diff once into per-file arrays.
+    
+    Args:
+        diff: The unified diff
+        
+    Returns:
+        Parallel lists, one entry per file: "files" (paths), "spans" ((start, end)
+        character offsets of the file's section in the diff), "additions" and
+        "deletions" (line counts); plus "hunks", one (file index, old start,
+        new start) entry per hunk
+    """
+    parsed = {"files": [], "spans": [], "additions": [], "deletions": [], "hunks": []}
+    offset = 0
+    for path, section in split_diff(diff):
+        start, offset = offset, offset + len(section)
+        if path is None:
+            continue
+        index = len(parsed["files"])
+        additions = deletions = 0
+        body_start = section.find("\n@@ ")
+        if body_start != -1:
+            for line in section[body_start + 1:].splitlines():
+                if line.startswith("+"):
+                    additions += 1
+                elif line.startswith("-"):
+                    deletions += 1
+            parsed["hunks"].extend(
+                (index, int(match.group(1)), int(match.group(2)))
+                for match in _HUNK_HEADER_RE.finditer(section, body_start + 1)
+            )
+        parsed["files"].append(path)
+        parsed["spans"].append((start, offset))
+        parsed["additions"].append(additions)
+        parsed["deletions"].append(deletions)
+    return parsed
 
 class PRRetrieverAgent:
     """Agent that fetches PR metadata using GitHub MCP"""
@@ -21,7 +116,6 @@ class PRRetrieverAgent:
             model_name: The name of the LLM model to use
         """
         self.model_name = model_name
-        self.llm = init_chat_model(model_name)
     
     async def run(self, state: Dict[str, Any], repo_owner: str, repo_name: str, pr_number: int = None) -> Dict[str, Any]:
         """Run the PR Retriever Agent.
@@ -35,39 +129,57 @@ class PRRetrieverAgent:
         Returns:
             Updated workflow state with PR data
         """
-        print(f"Running PR Retriever Agent for {repo_owner}/{repo_name}...")
+        logger.info("Running PR Retriever Agent for %s/%s...", repo_owner, repo_name)
         
         try:
-            # Get GitHub tools
-            github_tools = get_github_tools(repo_owner=repo_owner, repo_name=repo_name, pr_number=pr_number)
+            # Extract PR data; the PR number is resolved once and the info,
+            # files and diff are then fetched concurrently
+            pr_info, pr_files, pr_diff = await fetch_pr_bundle(repo_owner, repo_name, pr_number)
             
-            # Extract PR data using tools
-            pr_info = await github_tools[0]._arun()  # GetPRTool
-            pr_files = await github_tools[1]._arun()  # GetPRFilesTool
-            pr_diff = await github_tools[2]._arun()   # GetPRDiffTool
+            # Only the names of non-reviewable files are kept, not their diff
+            diff, skipped_files = self._strip_diff(pr_diff)
             
-            # Combine the data into a structured format
+            # Combine the data into a minimal structured format
             pr_data = {
                 "pr_number": pr_info.get("number"),
                 "title": pr_info.get("title"),
                 "description": pr_info.get("body"),
                 "author": pr_info.get("user", {}).get("login"),
-                "files_changed": pr_files,
-                "diff": pr_diff,
+                "files_changed": self._minimize_files(pr_files),
+                "diff": diff,
+                "skipped_files": skipped_files,
                 "commit_messages": self._extract_commit_messages(pr_info)
             }
             
-            # Update the state with PR data
-            state["pr_data"] = json.dumps(pr_data, indent=2)
+            # Update the state with PR data, serialized compactly since it is
+            # sent verbatim to every LLM stage
+            state["pr_data"] = orjson.dumps(pr_data).decode()
             state["pr_number"] = pr_data["pr_number"]
             state["pr_title"] = pr_data["title"]
             state["pr_author"] = pr_data["author"]
+            # The diff is parsed once here so the later agents need not
+            # split it again
+            diff_parsed = parse_diff(diff) if isinstance(diff, str) else None
+            if diff_parsed is not None:
+                state["diff_parsed"] = diff_parsed
+            
+            # Trivial PRs get a templated review instead of the LLM stages
+            reason = self._trivial_reason(pr_files, diff_parsed, skipped_files)
+            if reason:
+                state["final_review"] = TRIVIAL_REVIEW_TEMPLATE.format(
+                    title=pr_data["title"] or "Untitled PR",
+                    pr_number=pr_data["pr_number"] or "N/A",
+                    author=pr_data["author"] or "Unknown",
+                    files_changed=len(pr_files),
+                    reason=reason
+                ).strip()
+                logger.info("PR #%s is a trivial change (%s), skipping the detailed review", pr_data["pr_number"], reason)
             
-            print(f"Successfully retrieved data for PR #{pr_data['pr_number']}: {pr_data['title']}")
+            logger.info("Successfully retrieved data for PR #%s: %s", pr_data["pr_number"], pr_data["title"])
             return state
             
         except Exception as e:
-            print(f"Error in PR Retriever Agent: {str(e)}")
+            logger.error("Error in PR Retriever Agent: %s", e)
             state["error"] = f"Error in PR Retriever Agent: {str(e)}"
             return state
     
@@ -79,3 +191,59 @@ class PRRetrieverAgent:
                 if "commit" in commit and "message" in commit["commit"]:
                     messages.append(commit["commit"]["message"])
         return messages
+    
+    def _trivial_reason(self, pr_files: Any, diff_parsed: Optional[Dict[str, List[Any]]] = None,
+                        skipped_files: Optional[List[str]] = None) -> Optional[str]:
+        """Return why a PR is trivial enough to skip the review, or None."""
+        if diff_parsed is not None and not diff_parsed["files"]:
+            # Nothing is left to review once binary, generated and lock files
+            # and test fixtures are stripped from the diff
+            if skipped_files:
+                return "no reviewable changes"
+            # A diff without any file section (empty, an error message or an
+            # unexpected format) says nothing about the PR, so it is reviewed
+            return None
+        
+        if not isinstance(pr_files, list) or not pr_files or \
+           not all(isinstance(file, dict) and file.get("filename") for file in pr_files):
+            return None
+        
+        filenames = [file["filename"] for file in pr_files]
+        if all(filename.endswith(_DOC_EXTENSIONS) or _DOC_NAME_RE.search(filename) for filename in filenames):
+            return "documentation only"
+        if all(_LOCKFILE_RE.search(filename) for filename in filenames):
+            return "lock files only"
+        total_added = sum(file.get("additions") or 0 for file in pr_files)
+        if total_added < TRIVIAL_PR_MAX_ADDITIONS:
+            return f"{total_added} line(s) added"
+        return None
+    
+    def _minimize_files(self, pr_files: Any) -> Any:
+        """Keep only the changed-file fields the reviewers need."""
+        if not isinstance(pr_files, list):
+            return pr_files
+        return [
+            {key: file[key] for key in _FILE_KEYS if key in file} if isinstance(file, dict) else file
+            for file in pr_files
+        ]
+    
+    def _strip_diff(self, pr_diff: Any) -> Tuple[Any, List[str]]:
+        """Drop binary, generated and lock files and test fixtures from a unified diff.
+        
+        Returns:
+            The stripped diff and the paths of the files that were dropped
+        """
+        if not isinstance(pr_diff, str):
+            return pr_diff, []
+        
+        sections = []
+        skipped_files = []
+        for path, section in split_diff(pr_diff):
+            if path is not None:
+                is_binary = "\nBinary files " in section or "\nGIT binary patch" in section
+                if is_binary or _FIXTURE_PATH_RE.search(path) or \
+                   _GENERATED_PATH_RE.search(path) or _LOCKFILE_RE.search(path):
+                    skipped_files.append(path)
+                    continue
+            sections.append(section)
+        return "".join(sections), skipped_files
@@ -2,20 +2,83 @@
 Supervisor Agent - Coordinates the PR review process and produces final summary
 """
 
-from typing import Dict, Any
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate
+import logging
+import os
+from typing import Dict, Any, List
 from langchain_core.tools import BaseTool, ToolException
 from langchain_core.callbacks.manager import CallbackManagerForToolRun
 
+from src.cache.llm_cache import cached_invoke
+from src.tools.llm_tools import (
+    DEFAULT_ESCALATION_POLICY,
+    build_review_prompt,
+    format_review_messages,
+    get_model,
+    parse_json_response,
+)
+
+logger = logging.getLogger(__name__)
+
+# PRs with more risky practices than this get an LLM-written final review
+SUPERVISOR_LLM_RISK_THRESHOLD = int(os.getenv("SUPERVISOR_LLM_RISK_THRESHOLD", "5"))
+
+FINAL_REVIEW_TEMPLATE = """# PR Review: {title}
+
+## Overview
+- **PR:** #{pr_number}
+- **Author:** {author}
+- **Files changed:** {files_changed}
+
+## Summary of Changes
+{summary}
+
+## Key Findings
+### Risky Practices
+{risky_practices}
+
+### Code Quality Issues
+{code_quality_issues}
+
+## Review Comments
+### File Comments
+{file_comments}
+
+### General Comments
+{general_comments}
+
+## Overall Assessment
+{assessment}
+
+## Next Steps
+{next_steps}
+"""
+
+_FINAL_REVIEW_PROMPT = build_review_prompt("""You are the Supervisor Agent.
+Synthesize the PR data, the code analysis and the review comments below into a comprehensive PR review summary.
+
+Your summary should include:
+1. PR overview (title, author, scope of changes)
+2. Key findings from the code analysis
+3. Most important review comments and suggestions
+4. Overall assessment (approve, request changes, etc.)
+5. Next steps for the PR author
+
+Respond in the MARKDOWN format.
+
+Code Analysis:
+{code_analysis}
+
+Review Comments:
+{review_comments}""")
+
 class FinalReviewTool(BaseTool):
     """Tool for generating a final PR review summary."""
     
     name: str = "final_review_tool"
     description: str = "Generates a comprehensive PR review summary"
     
-    model_name: str = "openai:gpt-4.1"
+    # The final judgment always uses the strong model
+    model_name: str = DEFAULT_ESCALATION_POLICY.strong_model
     
     def _run(self, *args, **kwargs) -> str:
         """Synchronous run method required by BaseTool."""
@@ -24,43 +87,18 @@ class FinalReviewTool(BaseTool):
     async def _arun(self, pr_data: str, code_analysis: str, review_comments: str, run_manager: CallbackManagerForToolRun = None) -> str:
         """Run the tool asynchronously."""
         try:
-            # Initialize LLM
-            model = init_chat_model(self.model_name)
+            # Get the (cached) LLM
+            model = get_model(self.model_name)
             
-            # Create system message
-            system_message = SystemMessage(
-                content="You are the Supervisor Agent. Your task is to synthesize all the information from the PR review process and produce a final summary."
+            # Create prompt for final review summary, with the PR data first
+            # so it is shared as a cached prefix with the other stages
+            messages = format_review_messages(
+                _FINAL_REVIEW_PROMPT, self.model_name,
+                pr_data=pr_data, code_analysis=code_analysis, review_comments=review_comments
             )
             
-            # Create prompt for final review summary
-            prompt_template = ChatPromptTemplate.from_messages([
-                system_message,
-                HumanMessage(content=f"""
-                Synthesize the following information into a comprehensive PR review summary:
-                
-                PR Data:
-                {pr_data}
-                
-                Code Analysis:
-                {code_analysis}
-                
-                Review Comments:
-                {review_comments}
-                
-                Your summary should include:
-                1. PR overview (title, author, scope of changes)
-                2. Key findings from the code analysis
-                3. Most important review comments and suggestions
-                4. Overall assessment (approve, request changes, etc.)
-                5. Next steps for the PR author
-                
-                Format your response as a well-structured markdown document.
-                """)
-            ])
-            
             # Get final review summary from the LLM
-            response = await model.ainvoke(prompt_template.format_messages())
-            return response.content
+            return await cached_invoke(model, messages)
             
         except Exception as e:
             raise ToolException(f"Error generating final review summary: {str(e)}")
@@ -68,7 +106,7 @@ class FinalReviewTool(BaseTool):
 class SupervisorAgent:
     """Agent that coordinates the review process and produces final summary"""
     
-    def __init__(self, model_name: str = "openai:gpt-4.1"):
+    def __init__(self, model_name: str = DEFAULT_ESCALATION_POLICY.strong_model):
         """Initialize the Supervisor Agent.
         
         Args:
@@ -86,7 +124,7 @@ class SupervisorAgent:
         Returns:
             Updated workflow state with final review
         """
-        print("Running Supervisor Agent...")
+        logger.info("Running Supervisor Agent...")
         
         try:
             # Check if we have required data
@@ -96,20 +134,78 @@ class SupervisorAgent:
                 state["error"] = "Error: Missing data from one or more agents"
                 return state
             
-            # Generate final review summary
-            final_review = await self.final_review_tool._arun(
-                state["pr_data"], 
-                state["code_analysis"], 
-                state["review_comments"]
-            )
+            analysis = parse_json_response(state["code_analysis"])
+            comments = parse_json_response(state["review_comments"])
+            pr_data = parse_json_response(state["pr_data"])
+            
+            # The earlier stages already produced structured output, so the
+            # summary is stitched together locally unless the PR is complex
+            # or an earlier response could not be parsed
+            risky_count = state.get("risky_practices_count") or 0
+            if analysis is None or comments is None or pr_data is None or \
+               risky_count > SUPERVISOR_LLM_RISK_THRESHOLD:
+                final_review = await self.final_review_tool._arun(
+                    state["pr_data"], 
+                    state["code_analysis"], 
+                    state["review_comments"]
+                )
+            else:
+                final_review = self._render_final_review(pr_data, analysis, comments)
             
             # Update the state with final review
             state["final_review"] = final_review
                 
-            print("Final review summary generated successfully")
+            logger.info("Final review summary generated successfully")
             return state
             
         except Exception as e:
-            print(f"Error in Supervisor Agent: {str(e)}")
+            logger.error("Error in Supervisor Agent: %s", e)
             state["error"] = f"Error in Supervisor Agent: {str(e)}"
             return state
+    
+    def _render_final_review(self, pr_data: Dict[str, Any], analysis: Dict[str, Any], comments: Dict[str, Any]) -> str:
+        """Render the final review from the structured agent outputs."""
+        risky_practices = analysis.get("risky_practices") or []
+        quality_issues = analysis.get("code_quality_issues") or []
+        files_changed = pr_data.get("files_changed")
+        
+        if risky_practices:
+            assessment = f"**Request changes** - {len(risky_practices)} risky practice(s) should be addressed before merging."
+            next_steps = "Address the risky practices listed above and request a new review."
+        elif quality_issues:
+            assessment = f"**Comment** - no blocking risks were found, but {len(quality_issues)} code quality issue(s) are worth addressing."
+            next_steps = "Consider the suggestions above; none of them block merging."
+        else:
+            assessment = "**Approve** - no risks or code quality issues were identified."
+            next_steps = "No action required."
+        
+        return FINAL_REVIEW_TEMPLATE.format(
+            title=pr_data.get("title") or "Untitled PR",
+            pr_number=pr_data.get("pr_number") or "N/A",
+            author=pr_data.get("author") or "Unknown",
+            files_changed=len(files_changed) if isinstance(files_changed, list) else "N/A",
+            summary=analysis.get("summary") or "No summary available.",
+            risky_practices=self._format_items(risky_practices, "description"),
+            code_quality_issues=self._format_items(quality_issues, "description"),
+            file_comments=self._format_items(comments.get("file_comments") or [], "comment"),
+            general_comments=self._format_items(comments.get("general_comments") or [], "comment"),
+            assessment=assessment,
+            next_steps=next_steps
+        ).strip()
+    
+    def _format_items(self, items: List[Any], text_key: str) -> str:
+        """Format findings or comments as a markdown bullet list."""
+        if not items:
+            return "- None"
+        
+        lines = []
+        for item in items:
+            if not isinstance(item, dict):
+                lines.append(f"- {item}")
+                continue
+            location = item.get("file")
+            if location and item.get("line") is not None:
+                location = f"{location}:{item['line']}"
+            prefix = f"`{location}`: " if location else ""
+            lines.append(f"- {prefix}{item.get(text_key, '')}")
+        return "\n".join(lines)
@@ -0,0 +1,3 @@
+"""
+Cache package for PR review system
+"""
@@ -0,0 +1,56 @@
+"""
+ETag cache for PR review system.
+Revalidates cached GitHub API responses with If-None-Match, so unchanged
+resources come back as bodiless 304 responses that do not count against the
+GitHub rate limit.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+
+class ETagCache:
+    """Bounded in-memory cache of GitHub API responses keyed by (method, url)."""
+    
+    def __init__(self, max_entries: int = 256):
+        """Initialize the ETag cache.
+        
+        Args:
+            max_entries: Maximum number of responses to keep
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, Any]]" = OrderedDict()
+    
+    async def get(self, client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[Any, Optional[str]]:
+        """GET a JSON resource, revalidating any cached copy with its ETag.
+        
+        Args:
+            client: The HTTP client to issue the request with
+            url: The resource URL
+            headers: Additional request headers
+            
+        Returns:
+            The response body and its current ETag (None if GitHub sent none)
+        """
+        key = ("GET", url)
+        cached = self._entries.get(key)
+        request_headers = dict(headers or {})
+        if cached:
+            request_headers["If-None-Match"] = cached[0]
+        
+        response = await client.get(url, headers=request_headers)
+        if response.status_code == 304 and cached:
+            self._entries.move_to_end(key)
+            return cached[1], cached[0]
+        
+        response.raise_for_status()
+        body = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body, etag
@@ -0,0 +1,200 @@
+"""
+LLM response cache for PR review system.
+Stores model responses on disk keyed by a hash of the model, prompt and
+temperature, so re-reviewing an unchanged PR does not repeat the LLM calls.
+Whole agent results are cached the same way by ``LLMCache``, optionally
+falling back to the result for the most similar earlier PR.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.embeddings import init_embeddings
+from langchain_core.messages import BaseMessage
+
+from src.tools.llm_tools import ainvoke
+
+# Directory holding one JSON file per cached response
+LLM_CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", Path.home() / ".cache" / "pr_reviewer" / "llm"))
+
+# Seconds a cached response stays valid; 0 disables the cache
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+
+# Minimum cosine similarity for a semantic cache hit; 0 disables the
+# semantic fallback so only exact hits are served
+LLM_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", "0"))
+
+LLM_CACHE_EMBEDDING_MODEL = os.getenv("LLM_CACHE_EMBEDDING_MODEL", "openai:text-embedding-3-small")
+
+# Only the start of long texts is embedded, to stay within the model's input limit
+_EMBEDDING_MAX_CHARS = 16000
+
+
+def _cache_key(model: Any, messages: List[BaseMessage], temperature: float) -> str:
+    """Compute the cache key for a model call."""
+    model_name = getattr(model, "model_name", None) or getattr(model, "model", "") or type(model).__name__
+    payload = {
+        "model": model_name,
+        "messages": [{"type": message.type, "content": message.content} for message in messages],
+        "temperature": temperature,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _read(path: Path) -> Optional[Any]:
+    """Read a cached value, ignoring missing or expired entries."""
+    try:
+        with open(path, "r") as cache_file:
+            entry = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    if entry.get("expires_at", 0) < time.time():
+        return None
+    return entry.get("content")
+
+
+def _write(path: Path, content: Any, ttl: int = LLM_CACHE_TTL) -> None:
+    """Write a value to the cache atomically."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Writes run in worker threads, so each one gets its own temporary file
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=f"{path.stem}.", suffix=".tmp",
+                                         delete=False) as cache_file:
+            json.dump({"expires_at": time.time() + ttl, "content": content}, cache_file)
+        try:
+            os.replace(cache_file.name, path)
+        except OSError:
+            os.unlink(cache_file.name)
+            raise
+    except OSError:
+        # A failed cache write must never fail the review itself
+        pass
+
+
+def _cosine_similarity(a: List[float], b: List[float]) -> float:
+    """Compute the cosine similarity of two vectors."""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@functools.lru_cache(maxsize=1)
+def _get_embeddings() -> Any:
+    """Get the embedding model used for semantic cache lookups."""
+    return init_embeddings(LLM_CACHE_EMBEDDING_MODEL)
+
+
+class LLMCache:
+    """Cache of agent results with exact lookups and an optional semantic fallback.
+    
+    Exact hits are keyed by a hash of the key parts, e.g. the agent name and
+    the PR data. When a semantic threshold is set, a miss falls back to the
+    entry whose text embedding is most similar, if it is at least that close.
+    """
+    
+    def __init__(self, namespace: str, ttl: int = LLM_CACHE_TTL,
+                 semantic_threshold: float = LLM_CACHE_SEMANTIC_THRESHOLD):
+        """Initialize the cache.
+        
+        Args:
+            namespace: Subdirectory of the cache directory holding the entries
+            ttl: Seconds an entry stays valid; 0 disables the cache
+            semantic_threshold: Minimum cosine similarity for a semantic hit; 0 disables it
+        """
+        self.cache_dir = LLM_CACHE_DIR / namespace
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        # (embedding, key) pairs of the entries written by this process
+        self._index: List[Tuple[List[float], str]] = []
+    
+    @staticmethod
+    def cache_key(*parts: Any) -> str:
+        """Compute the cache key for the given key parts."""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+    
+    async def get(self, key: str, text: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a cached result.
+        
+        Args:
+            key: The exact cache key
+            text: The text to match semantically if there is no exact hit
+            
+        Returns:
+            The cached result, or None on a miss
+        """
+        if self.ttl <= 0:
+            return None
+        
+        result = await asyncio.to_thread(_read, self.cache_dir / f"{key}.json")
+        if result is not None or not self._semantic_enabled(text):
+            return result
+        
+        embedding = await self._embed(text)
+        best_similarity, best_key = 0.0, None
+        for entry_embedding, entry_key in self._index:
+            similarity = _cosine_similarity(embedding, entry_embedding)
+            if similarity > best_similarity:
+                best_similarity, best_key = similarity, entry_key
+        if best_key is None or best_similarity < self.semantic_threshold:
+            return None
+        return await asyncio.to_thread(_read, self.cache_dir / f"{best_key}.json")
+    
+    async def set(self, key: str, result: Dict[str, Any], text: Optional[str] = None, ttl: Optional[int] = None) -> None:
+        """Store a result.
+        
+        Args:
+            key: The exact cache key
+            result: The JSON-serializable result
+            text: The text to index for semantic lookups
+            ttl: Seconds the entry stays valid, defaulting to the cache TTL
+        """
+        if self.ttl <= 0:
+            return
+        
+        await asyncio.to_thread(_write, self.cache_dir / f"{key}.json", result, ttl or self.ttl)
+        if self._semantic_enabled(text):
+            self._index.append((await self._embed(text), key))
+    
+    def _semantic_enabled(self, text: Optional[str]) -> bool:
+        """Check whether semantic lookups apply to a text."""
+        return self.semantic_threshold > 0 and bool(text)
+    
+    async def _embed(self, text: str) -> List[float]:
+        """Embed the start of a text."""
+        return await _get_embeddings().aembed_query(text[:_EMBEDDING_MAX_CHARS])
+
+
+async def cached_invoke(model: Any, messages: List[BaseMessage], *, temperature: float = 0, json_mode: bool = False) -> str:
+    """Invoke a chat model, returning a cached response when one exists.
+
+    Only deterministic calls should be cached, which is why the models
+    returned by ``get_model`` are initialized with ``temperature=0``.
+
+    Args:
+        model: The chat model to invoke
+        messages: The formatted prompt messages
+        temperature: The sampling temperature the model was initialized with
+        json_mode: Whether the response is expected to be a JSON object
+
+    Returns:
+        The text content of the (possibly cached) model response
+    """
+    if LLM_CACHE_TTL <= 0:
+        return await ainvoke(model, messages, json_mode=json_mode)
+
+    path = LLM_CACHE_DIR / f"{_cache_key(model, messages, temperature)}.json"
+    content = await asyncio.to_thread(_read, path)
+    if content is not None:
+        return content
+
+    content = await ainvoke(model, messages, json_mode=json_mode)
+    await asyncio.to_thread(_write, path, content)
+    return content
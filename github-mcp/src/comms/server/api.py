@@ -3,16 +3,85 @@ FastAPI endpoint for GitHub PR Review System
 """
 
 import re
-import asyncio
+import hashlib
+import logging
+import os
+from contextlib import asynccontextmanager
 from typing import Optional
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, validator
+import httpx
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Request, Response
+from pydantic import BaseModel, PrivateAttr, model_validator
 from src.main import run_pr_review
+from src.tools.github_tools import (
+    DEFAULT_MCP_PATH,
+    close_shared_mcp_clients,
+    get_pr_head_sha,
+    get_shared_mcp_client,
+    set_shared_clients,
+)
+
+logger = logging.getLogger(__name__)
+
+# Log level of the review system under the API server; agent progress
+# messages are INFO, so they are silenced by default
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING")
+
+# Routes the review system's and uvicorn's logs through a single handler
+LOGGING_CONFIG = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "default": {"format": "%(asctime)s %(levelname)s %(name)s: %(message)s"}
+    },
+    "handlers": {
+        "default": {"class": "logging.StreamHandler", "formatter": "default", "stream": "ext://sys.stderr"}
+    },
+    "root": {"handlers": ["default"], "level": LOG_LEVEL},
+    "loggers": {
+        "uvicorn": {"handlers": ["default"], "level": "INFO", "propagate": False},
+        "uvicorn.error": {"level": "INFO"},
+        "uvicorn.access": {"handlers": ["default"], "level": "INFO", "propagate": False}
+    }
+}
+
+# GitHub repository URL, capturing the owner and repository name
+_REPO_URL_RE = re.compile(r'^https?://github\.com/([^/]+)/([^/]+)/?.*$')
+
+# Seconds a review stays cached; a PR at the same head commit gets the same review
+REVIEW_CACHE_TTL = 3600
+
+# Reviews keyed by (owner, repo, PR number, head SHA)
+_REVIEW_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=REVIEW_CACHE_TTL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the HTTP and MCP clients shared by all requests and close them on shutdown."""
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=64, keepalive_expiry=30)
+    )
+    set_shared_clients(http_client=app.state.http)
+    try:
+        # Start the MCP server up front rather than on the first request
+        app.state.mcp_client = await get_shared_mcp_client(DEFAULT_MCP_PATH)
+    except Exception as e:
+        # The tools retry starting it on the next request
+        logger.warning("Could not start the shared GitHub MCP client: %s", e)
+        app.state.mcp_client = None
+    
+    try:
+        yield
+    finally:
+        set_shared_clients()
+        await close_shared_mcp_clients()
+        await app.state.http.aclose()
 
 app = FastAPI(
     title="GitHub PR Review API",
     description="API for reviewing GitHub Pull Requests",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 class PRReviewRequest(BaseModel):
@@ -20,22 +89,21 @@ class PRReviewRequest(BaseModel):
     repo_url: str
     pr_number: Optional[int] = None
     
-    @validator('repo_url')
-    def validate_repo_url(cls, v):
-        """Validate GitHub repository URL."""
-        pattern = r'^https?://github\.com/([^/]+)/([^/]+)/?.*$'
-        match = re.match(pattern, v)
+    _repo_owner: Optional[str] = PrivateAttr(default=None)
+    _repo_name: Optional[str] = PrivateAttr(default=None)
+    
+    @model_validator(mode="after")
+    def validate_repo_url(self):
+        """Validate GitHub repository URL and keep the parsed owner and repo."""
+        match = _REPO_URL_RE.match(self.repo_url)
         if not match:
             raise ValueError("Invalid GitHub repository URL. Format should be: https://github.com/owner/repo")
-        return v
+        self._repo_owner, self._repo_name = match.groups()
+        return self
     
     def parse_owner_and_repo(self):
-        """Parse owner and repo from the GitHub URL."""
-        pattern = r'^https?://github\.com/([^/]+)/([^/]+)/?.*$'
-        match = re.match(pattern, self.repo_url)
-        if match:
-            return match.group(1), match.group(2)
-        return None, None
+        """Return the owner and repo parsed from the GitHub URL during validation."""
+        return self._repo_owner, self._repo_name
 
 class PRReviewResponse(BaseModel):
     """Response model for PR review API."""
@@ -48,7 +116,7 @@ class PRReviewResponse(BaseModel):
     final_review: str
 
 @app.post("/review-pr", response_model=PRReviewResponse)
-async def review_pr(request: PRReviewRequest):
+async def review_pr(request: PRReviewRequest, http_request: Request, response: Response):
     """
     Review a GitHub Pull Request.
     
@@ -59,10 +127,25 @@ async def review_pr(request: PRReviewRequest):
     if not owner or not repo:
         raise HTTPException(status_code=400, detail="Failed to parse repository owner and name from URL")
     
+    # A review only changes with the PR's head commit, so repeated requests
+    # for the same commit are answered from the cache
+    head_sha = await get_pr_head_sha(owner, repo, request.pr_number) if request.pr_number else None
+    cache_key = (owner, repo, request.pr_number, head_sha)
+    cache_headers = {}
+    if head_sha:
+        etag = '"' + hashlib.sha1(repr(cache_key).encode("utf-8")).hexdigest() + '"'
+        cache_headers = {"ETag": etag, "Cache-Control": f"max-age={REVIEW_CACHE_TTL}"}
+        if http_request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=cache_headers)
+        cached_review = _REVIEW_CACHE.get(cache_key)
+        if cached_review is not None:
+            response.headers.update(cache_headers)
+            return cached_review
+    
     try:
         result = await run_pr_review(owner, repo, request.pr_number)
         
-        return PRReviewResponse(
+        review = PRReviewResponse(
             repo_owner=owner,
             repo_name=repo,
             pr_number=result.get("pr_number"),
@@ -73,6 +156,12 @@ async def review_pr(request: PRReviewRequest):
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reviewing PR: {str(e)}")
+    
+    # Failed reviews are not cached so the next request retries them
+    if head_sha and result.get("final_review") and not result.get("error"):
+        _REVIEW_CACHE[cache_key] = review
+        response.headers.update(cache_headers)
+    return review
 
 @app.get("/health")
 async def health_check():
@@ -81,4 +170,4 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=LOGGING_CONFIG)
@@ -1,13 +1,12 @@
 """
 A simplified test script to directly interact with the github-mcp-server 
-in stdio mode using subprocess
+in stdio mode using an asyncio subprocess
 """
 import os
 import json
-import subprocess
+import asyncio
+import itertools
 import logging
-import time
-import select
 from dotenv import load_dotenv
 
 # Setup logging
@@ -17,17 +16,49 @@ logger = logging.getLogger("mcp_test")
 # Load environment variables
 load_dotenv('/home/srihari/Documents/GEnAi/fynd/.env')
 
-def read_with_timeout(proc, timeout=5):
-    """Read from subprocess stdout with timeout"""
-    ready_to_read, _, _ = select.select([proc.stdout], [], [], timeout)
-    if ready_to_read:
-        return proc.stdout.readline()
-    return None
+# Longest response line read from the server; PR diffs easily exceed the
+# 64 KiB asyncio default
+_STDOUT_LIMIT = 64 * 1024 * 1024
 
-def try_command(proc, command, command_id=None):
-    """Try sending a command to the MCP server and read the response"""
+# Monotonic JSON-RPC request ids, unique even for commands sent concurrently
+_command_ids = itertools.count(1)
+
+async def pump_responses(stdout, pending):
+    """Read responses from the server and resolve the matching pending requests"""
+    error = ConnectionError("MCP server closed its stdout")
+    try:
+        while True:
+            line = await stdout.readline()
+            if not line:
+                break
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                logger.error(f"Failed to parse response as JSON: {line!r}")
+                continue
+            if not isinstance(message, dict):
+                logger.info(f"Got non-object message: {message}")
+                continue
+            
+            future = pending.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+            else:
+                logger.info(f"Got unsolicited message: {message}")
+    except Exception as e:
+        logger.error(f"Stopped reading server responses: {e}")
+        error = ConnectionError(f"Stopped reading MCP server responses: {e}")
+    finally:
+        # No outstanding request can be answered once the reader stops
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+        pending.clear()
+
+async def try_command(proc, pending, command, command_id=None, timeout=5):
+    """Try sending a command to the MCP server and wait for its response"""
     if command_id is None:
-        command_id = f"cmd-{int(time.time())}"
+        command_id = f"cmd-{next(_command_ids)}"
     
     request = {
         "jsonrpc": "2.0",
@@ -37,30 +68,27 @@ def try_command(proc, command, command_id=None):
     
     logger.info(f"Sending command: {command} (id: {command_id})")
     
+    future = asyncio.get_running_loop().create_future()
+    pending[command_id] = future
     try:
         # Send request
-        proc.stdin.write(json.dumps(request) + "\n")
-        proc.stdin.flush()
-        
-        # Try to read response with timeout
-        logger.info("Waiting for response...")
-        response = read_with_timeout(proc)
+        proc.stdin.write((json.dumps(request) + "\n").encode())
+        await proc.stdin.drain()
         
-        if response:
-            logger.info(f"Got response: {response.strip()}")
-            try:
-                return json.loads(response)
-            except json.JSONDecodeError:
-                logger.error(f"Failed to parse response as JSON: {response}")
-                return None
-        else:
-            logger.warning("No response received within timeout")
-            return None
+        # Wait for the reader task to deliver the response
+        response = await asyncio.wait_for(future, timeout)
+        logger.info(f"Got response for {command}: {response}")
+        return response
+    except asyncio.TimeoutError:
+        logger.warning(f"No response received for {command} within timeout")
+        return None
     except Exception as e:
         logger.error(f"Error in command {command}: {str(e)}")
         return None
+    finally:
+        pending.pop(command_id, None)
 
-def main():
+async def main():
     # Get token
     token = os.getenv("GITHUB_TOKEN")
     if not token:
@@ -81,24 +109,29 @@ def main():
     # Check stderr output from server for diagnostic info
     stderr_file = open("/home/srihari/Documents/GEnAi/githubmcp/server_stderr.log", "w")
     
+    proc = None
+    reader = None
     try:
         # Start server process with stderr redirected to file
         logger.info(f"Starting server: {server_path}")
-        proc = subprocess.Popen(
-            [server_path, "stdio", "--log-file", "/home/srihari/Documents/GEnAi/githubmcp/server.log"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
+        proc = await asyncio.create_subprocess_exec(
+            server_path, "stdio", "--log-file", "/home/srihari/Documents/GEnAi/githubmcp/server.log",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=_STDOUT_LIMIT,
             stderr=stderr_file,
             env=env,
-            text=True,
-            bufsize=1,
         )
         
+        # Dispatch responses to the waiting commands by JSON-RPC id
+        pending = {}
+        reader = asyncio.create_task(pump_responses(proc.stdout, pending))
+        
         # Give server a moment to initialize
         logger.info("Waiting for server to initialize...")
-        time.sleep(2)
+        await asyncio.sleep(2)
         
-        # Try different command variations
+        # Try different command variations, all in flight at once
         commands_to_try = [
             "discover",
             "mcp.discover",
@@ -108,8 +141,9 @@ def main():
             "system.listMethods"  # Common JSON-RPC system method
         ]
         
-        for command in commands_to_try:
-            result = try_command(proc, command)
+        results = await asyncio.gather(*(try_command(proc, pending, command) for command in commands_to_try))
+        
+        for command, result in zip(commands_to_try, results):
             if result and "result" in result:
                 logger.info(f"Success with command: {command}")
                 if isinstance(result["result"], list):
@@ -144,16 +178,17 @@ def main():
         else:
             logger.info("No server log file found")
         
-        # Clean up
-        proc.terminate()
-        
     except Exception as e:
         logger.error(f"Error: {str(e)}")
     finally:
-        if 'proc' in locals():
+        # Clean up
+        if proc is not None and proc.returncode is None:
             proc.terminate()
+            await proc.wait()
+        if reader is not None:
+            reader.cancel()
         if not stderr_file.closed:
             stderr_file.close()
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
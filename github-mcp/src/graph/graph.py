@@ -2,92 +2,183 @@
 LangGraph setup for PR review workflow
 """
 
-from typing import Dict, Any, TypedDict, Optional
-from pydantic import BaseModel, Field
+import functools
+import operator
+from typing import TYPE_CHECKING, Annotated, Awaitable, Callable, Dict, Any, List, Tuple, TypedDict, Optional, Union
 from langgraph.graph import StateGraph, END
+from langgraph.types import Send
 
-from src.agents.pr_retriever import PRRetrieverAgent
-from src.agents.code_understanding import CodeUnderstandingAgent
-from src.agents.pr_review_comment import PRReviewCommentAgent
-from src.agents.supervisor import SupervisorAgent
+from src.cache.llm_cache import LLMCache
 
-# Define the state for our workflow
-class WorkflowState(BaseModel):
+if TYPE_CHECKING:
+    from src.agents.pr_retriever import PRRetrieverAgent
+    from src.agents.code_understanding import CodeUnderstandingAgent
+    from src.agents.pr_review_comment import PRReviewCommentAgent
+    from src.agents.supervisor import SupervisorAgent
+
+# Results of the LLM agents, keyed by agent and inputs
+_NODE_CACHE = LLMCache("nodes")
+
+def merge_errors(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    """Merge error messages reported by concurrently running agents."""
+    if not left:
+        return right
+    if not right or right == left:
+        return left
+    return f"{left}; {right}"
+
+# Define the state for our workflow: a plain dict, so the nodes pass it to
+# the agents without any validation or copying through a model; every field
+# is optional
+class WorkflowState(TypedDict, total=False):
     """State for the PR review workflow."""
     # PR data
-    pr_data: Optional[str] = None
-    pr_number: Optional[int] = None
-    pr_title: Optional[str] = None
-    pr_author: Optional[str] = None
+    pr_data: str
+    pr_number: Optional[int]
+    pr_title: Optional[str]
+    pr_author: Optional[str]
+    # The diff parsed once by the PR retriever (see parse_diff)
+    diff_parsed: Dict[str, Any]
     
-    # Analysis data
-    code_analysis: Optional[str] = None
-    analysis_summary: Optional[str] = None
-    risky_practices_count: Optional[int] = None
-    quality_issues_count: Optional[int] = None
+    # Analysis data; large diffs are first analyzed file by file, in
+    # parallel, and the per-file results collected here
+    file_analyses: Annotated[List[Dict[str, str]], operator.add]
+    code_analysis: str
+    analysis_summary: str
+    risky_practices_count: int
+    quality_issues_count: int
     
     # Review data
-    review_comments: Optional[str] = None
-    file_comments_count: Optional[int] = None
-    general_comments_count: Optional[int] = None
+    review_comments: str
+    file_comments_count: int
+    general_comments_count: int
     
     # Final review
-    final_review: Optional[str] = None
+    final_review: str
+    
+    # Error tracking; code understanding and review comments run concurrently
+    # and may both report an error
+    error: Annotated[Optional[str], merge_errors]
+
+class FileAnalysisState(TypedDict):
+    """Input of the per-file analysis of a large PR."""
+    file_data: Dict[str, Any]
+
+def _state_update(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the fields an agent changed, so concurrent agents never write the same field."""
+    return {key: value for key, value in after.items() if before.get(key) != value}
+
+async def _run_cached(agent_name: str, state: WorkflowState, run: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                      key_fields: Tuple[str, ...] = ("pr_data",), semantic: bool = True) -> Dict[str, Any]:
+    """Run an agent unless its result for the same inputs is already cached.
+    
+    Args:
+        agent_name: The name of the agent, part of the cache key
+        state: The current workflow state
+        run: The agent's run method
+        key_fields: The state fields the agent's result depends on
+        semantic: Whether the result may be reused for a similar PR
+        
+    Returns:
+        The state fields changed by the agent
+    """
+    before = dict(state)
+    key = LLMCache.cache_key(agent_name, *(before.get(field) for field in key_fields))
+    text = state.get("pr_data") if semantic else None
+    cached = await _NODE_CACHE.get(key, text=text)
+    if cached is not None:
+        return cached
     
-    # Error tracking
-    error: Optional[str] = None
+    update = _state_update(before, await run(dict(before)))
+    # Failed runs are not cached so they are retried
+    if not update.get("error"):
+        await _NODE_CACHE.set(key, update, text=text)
+    return update
+
+# Agents are stateless between runs, so one instance of each is shared. The
+# agent modules are imported when the first graph is built rather than when
+# this module is, so importing the graph stays cheap
+@functools.lru_cache(maxsize=None)
+def _pr_retriever_agent() -> "PRRetrieverAgent":
+    from src.agents.pr_retriever import PRRetrieverAgent
+    return PRRetrieverAgent()
+
+@functools.lru_cache(maxsize=None)
+def _code_understanding_agent() -> "CodeUnderstandingAgent":
+    from src.agents.code_understanding import CodeUnderstandingAgent
+    return CodeUnderstandingAgent()
+
+@functools.lru_cache(maxsize=None)
+def _pr_review_comment_agent() -> "PRReviewCommentAgent":
+    from src.agents.pr_review_comment import PRReviewCommentAgent
+    return PRReviewCommentAgent()
+
+@functools.lru_cache(maxsize=None)
+def _supervisor_agent() -> "SupervisorAgent":
+    from src.agents.supervisor import SupervisorAgent
+    return SupervisorAgent()
 
 # Agent functions - wrapped to handle async properly
 def create_pr_retriever_node(repo_owner: str, repo_name: str, pr_number: Optional[int] = None):
-    async def pr_retriever_node(state: WorkflowState) -> Dict[str, Any]:
+    agent = _pr_retriever_agent()
+    
+    async def pr_retriever_node(state: WorkflowState) -> WorkflowState:
         """Run the PR Retriever Agent."""
-        agent = PRRetrieverAgent()
-        result = await agent.run(state.dict(), repo_owner, repo_name, pr_number)
+        result = await agent.run(dict(state), repo_owner, repo_name, pr_number)
         return result
     return pr_retriever_node
 
 def create_code_understanding_node():
-    async def code_understanding_node(state: WorkflowState) -> Dict[str, Any]:
+    agent = _code_understanding_agent()
+    
+    async def code_understanding_node(state: WorkflowState) -> WorkflowState:
         """Run the Code Understanding Agent."""
-        agent = CodeUnderstandingAgent()
-        result = await agent.run(state.dict())
-        return result
+        return await _run_cached("code_understanding", state, agent.run)
     return code_understanding_node
 
+def create_analyze_file_node():
+    agent = _code_understanding_agent()
+    
+    async def analyze_file_node(state: FileAnalysisState) -> WorkflowState:
+        """Analyze a single file of a large PR."""
+        return await agent.run_file(state["file_data"])
+    return analyze_file_node
+
 def create_pr_review_comment_node():
-    async def pr_review_comment_node(state: WorkflowState) -> Dict[str, Any]:
+    agent = _pr_review_comment_agent()
+    
+    async def pr_review_comment_node(state: WorkflowState) -> WorkflowState:
         """Run the PR Review Comment Agent."""
-        agent = PRReviewCommentAgent()
-        result = await agent.run(state.dict())
-        return result
+        return await _run_cached("pr_review_comment", state, agent.run)
     return pr_review_comment_node
 
 def create_supervisor_node():
-    async def supervisor_node(state: WorkflowState) -> Dict[str, Any]:
+    agent = _supervisor_agent()
+    
+    async def supervisor_node(state: WorkflowState) -> WorkflowState:
         """Run the Supervisor Agent."""
-        agent = SupervisorAgent()
-        result = await agent.run(state.dict())
-        return result
+        # Skip the final review if either branch failed
+        if state.get("error"):
+            return {}
+        return await _run_cached(
+            "supervisor", state, agent.run,
+            key_fields=("pr_data", "code_analysis", "review_comments"), semantic=False
+        )
     return supervisor_node
 
 # Routing functions
-def route_after_pr_retrieval(state: WorkflowState) -> str:
+def route_after_pr_retrieval(state: WorkflowState) -> Union[str, List[Union[str, Send]]]:
     """Determine next step after PR retrieval."""
-    if state.error:
+    # Trivial PRs already have their final review
+    if state.get("error") or state.get("final_review"):
         return END
-    return "code_understanding"
-
-def route_after_code_understanding(state: WorkflowState) -> str:
-    """Determine next step after code understanding."""
-    if state.error:
-        return END
-    return "pr_review_comment"
-
-def route_after_pr_review(state: WorkflowState) -> str:
-    """Determine next step after PR review comments."""
-    if state.error:
-        return END
-    return "supervisor"
+    # The code analysis and the review comments only need the PR data, so
+    # both agents run concurrently; a large diff is first analyzed one file
+    # per node, and the code analysis then reduces the results
+    file_data = _code_understanding_agent().file_data(state)
+    if file_data:
+        return [Send("analyze_file", {"file_data": data}) for data in file_data] + ["pr_review_comment"]
+    return ["code_understanding", "pr_review_comment"]
 
 def route_after_supervisor(state: WorkflowState) -> str:
     """Determine next step after supervisor agent."""
@@ -110,6 +201,7 @@ def create_workflow_graph(repo_owner: str, repo_name: str, pr_number: Optional[i
     
     # Add nodes for each agent
     workflow.add_node("pr_retriever", create_pr_retriever_node(repo_owner, repo_name, pr_number))
+    workflow.add_node("analyze_file", create_analyze_file_node())
     workflow.add_node("code_understanding", create_code_understanding_node())
     workflow.add_node("pr_review_comment", create_pr_review_comment_node())
     workflow.add_node("supervisor", create_supervisor_node())
@@ -118,18 +210,12 @@ def create_workflow_graph(repo_owner: str, repo_name: str, pr_number: Optional[i
     workflow.add_conditional_edges(
         "pr_retriever",
         route_after_pr_retrieval,
-        {"code_understanding": "code_understanding", END: END}
-    )
-    workflow.add_conditional_edges(
-        "code_understanding",
-        route_after_code_understanding,
-        {"pr_review_comment": "pr_review_comment", END: END}
-    )
-    workflow.add_conditional_edges(
-        "pr_review_comment",
-        route_after_pr_review,
-        {"supervisor": "supervisor", END: END}
+        {"code_understanding": "code_understanding", "pr_review_comment": "pr_review_comment", END: END}
     )
+    workflow.add_edge("analyze_file", "code_understanding")
+    # The supervisor waits for both concurrent branches, which take a
+    # different number of steps when the diff is analyzed file by file
+    workflow.add_edge(["code_understanding", "pr_review_comment"], "supervisor")
     workflow.add_conditional_edges(
         "supervisor",
         route_after_supervisor,
@@ -141,3 +227,20 @@ def create_workflow_graph(repo_owner: str, repo_name: str, pr_number: Optional[i
     
     # Compile the graph
     return workflow.compile()
+
+@functools.lru_cache(maxsize=128)
+def get_workflow_graph(repo_owner: str, repo_name: str, pr_number: Optional[int] = None) -> StateGraph:
+    """Get the compiled workflow graph for a PR, compiling it only on first use.
+    
+    The graph holds no per-run state, so one compiled graph is safely shared
+    by concurrent runs for the same PR.
+    
+    Args:
+        repo_owner: The GitHub repository owner
+        repo_name: The GitHub repository name
+        pr_number: Optional PR number to review. If None, reviews the latest PR.
+        
+    Returns:
+        Compiled StateGraph for the PR review workflow
+    """
+    return create_workflow_graph(repo_owner, repo_name, pr_number)
@@ -4,56 +4,76 @@ Uses LangGraph to orchestrate a workflow of specialized agents.
 """
 import asyncio
 import argparse
-import os
-from typing import Dict, Any, Optional
+import logging
+import httpx
+from typing import Callable, Dict, Any, Optional
 from dotenv import load_dotenv
 
+# Load environment variables before the agents are created
+load_dotenv()
+
 # Import the workflow graph
-from src.graph.graph import create_workflow_graph, WorkflowState
+from src.graph.graph import get_workflow_graph, WorkflowState
+from src.tools.github_tools import close_shared_mcp_clients, set_shared_clients
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Default GitHub repository details
 DEFAULT_REPO_OWNER = "psf"
 DEFAULT_REPO_NAME = "black"
 
-async def run_pr_review(repo_owner: str, repo_name: str, pr_number: Optional[int] = None, verbose: bool = True) -> Dict[str, Any]:
+async def run_pr_review(repo_owner: str, repo_name: str, pr_number: Optional[int] = None, verbose: bool = True,
+                        on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
     """Run the PR review workflow.
     
     Args:
         repo_owner: The GitHub repository owner
         repo_name: The GitHub repository name
         pr_number: Optional PR number to review. If None, reviews the latest PR.
-        verbose: Whether to print progress messages to console
+        verbose: Whether to log progress messages
+        on_token: Optional callback receiving the final review's text as the
+            supervisor's LLM streams it
         
     Returns:
         The final workflow state with PR review results
     """
-    # Create the workflow graph
-    workflow = create_workflow_graph(repo_owner, repo_name, pr_number)
+    # Get the (cached) workflow graph
+    workflow = get_workflow_graph(repo_owner, repo_name, pr_number)
     
     if verbose:
-        print(f"\n=== Starting PR Review for {repo_owner}/{repo_name} ===\n")
+        logger.info("=== Starting PR Review for %s/%s ===", repo_owner, repo_name)
         if pr_number:
-            print(f"Reviewing PR #{pr_number}")
+            logger.info("Reviewing PR #%s", pr_number)
         else:
-            print("Reviewing latest open PR")
+            logger.info("Reviewing latest open PR")
     
     try:
-        # Run the workflow with an empty initial state
-        result = await workflow.ainvoke(WorkflowState())
+        # Run the workflow with an empty initial state, streaming the state
+        # after each step and the LLM tokens as they are generated
+        result = {}
+        stream_mode = ["values", "messages"] if on_token else "values"
+        async for event in workflow.astream(WorkflowState(), stream_mode=stream_mode):
+            mode, chunk = event if on_token else ("values", event)
+            if mode == "values":
+                result = chunk
+            else:
+                message, metadata = chunk
+                # Only the supervisor writes prose; the other agents stream JSON
+                if metadata.get("langgraph_node") == "supervisor" and isinstance(message.content, str) and message.content:
+                    on_token(message.content)
         return result
     except Exception as e:
         if verbose:
-            print(f"Error in PR review workflow: {str(e)}")
+            logger.exception("Error in PR review workflow: %s", e)
         raise
 
-def print_review_summary(result: Dict[str, Any]) -> None:
+def print_review_summary(result: Dict[str, Any], review_streamed: bool = False) -> None:
     """Print a summary of the PR review.
     
     Args:
         result: The workflow result
+        review_streamed: Whether the final review was already printed while it
+            was being generated
     """
     # Check for errors
     if 'error' in result and result['error']:
@@ -69,7 +89,9 @@ def print_review_summary(result: Dict[str, Any]) -> None:
         print(f"Author: {result.get('pr_author', 'Unknown')}")
     
     # Print the final review
-    if 'final_review' in result and result['final_review']:
+    if review_streamed:
+        print("\n(final review streamed above)")
+    elif 'final_review' in result and result['final_review']:
         print("\n" + result['final_review'])
     else:
         print("\nNo final review was generated.")
@@ -90,20 +112,38 @@ async def main():
                         help='Output results as JSON instead of human-readable format')
     args = parser.parse_args()
     
+    # One HTTP client serves all the direct GitHub API requests of the run
+    http_client = httpx.AsyncClient(timeout=10)
+    set_shared_clients(http_client=http_client)
     try:
-        # Run the PR review
-        result = await run_pr_review(args.owner, args.repo, args.pr)
+        # Run the PR review; in human-readable mode the final review is
+        # printed as it is generated
+        streamed = []
+        def print_token(token: str) -> None:
+            if not streamed:
+                print("\n=== FINAL REVIEW ===\n")
+            streamed.append(token)
+            print(token, end="", flush=True)
+        
+        result = await run_pr_review(args.owner, args.repo, args.pr, on_token=None if args.json else print_token)
         
         # Print the review summary
         if args.json:
             import json
             print(json.dumps(result, indent=2))
         else:
-            print_review_summary(result)
+            print_review_summary(result, review_streamed=bool(streamed))
         return result
     except Exception as e:
         print(f"Error: {str(e)}")
         return {"error": str(e)}
+    finally:
+        # Stop the MCP server subprocess started for this run; its owner task closes the client
+        await close_shared_mcp_clients()
+        set_shared_clients()
+        await http_client.aclose()
 
 if __name__ == "__main__":
+    # Show agent progress on the command line
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     asyncio.run(main())
@@ -3,17 +3,335 @@ GitHub API integration tools for PR review system.
 Uses GitHub MCP (Machine Callable Program) for API access.
 """
 
+import asyncio
+import copy
+import functools
+import logging
 import os
-from typing import Dict, List, Any, Optional, Union
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple, Final, Mapping
+import httpx
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_core.tools import BaseTool, ToolException
 from langchain_core.callbacks.manager import CallbackManagerForToolRun
 from pydantic import Field
 
+from src.cache.etag_cache import ETagCache
+
+logger = logging.getLogger(__name__)
+
 # GitHub repository configuration
 DEFAULT_REPO_OWNER = "psf"
 DEFAULT_REPO_NAME = "black"
 
+GITHUB_API_URL = "https://api.github.com"
+
+DEFAULT_MCP_PATH = "/home/srihari/Documents/GEnAi/githubmcp/github-mcp-server/github-mcp-server"
+
+# HTTP client registered by the API server, shared by all requests
+_shared_http_client: Optional[httpx.AsyncClient] = None
+
+# Long-lived MCP clients and their tools, keyed by server binary path; each
+# client is started on first use so the MCP server subprocess is spawned
+# once per process instead of once per tool call
+_shared_mcp_clients: Dict[str, MultiServerMCPClient] = {}
+_shared_mcp_tools: Dict[str, Dict[str, BaseTool]] = {}
+# The task holding each shared MCP client open, and the event that tells it to close the client
+_mcp_client_owners: Dict[str, Tuple[asyncio.Task, asyncio.Event]] = {}
+_MCP_LOCK = asyncio.Lock()
+
+# Maximum number of MCP tool calls in flight at once, across all runs; the
+# server handles one request at a time, so more would only queue up there
+MCP_MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", "4"))
+_MCP_SEM = asyncio.Semaphore(MCP_MAX_CONCURRENCY)
+
+async def _invoke_mcp_tool(tool: BaseTool, args: Dict[str, Any]) -> Any:
+    """Invoke an MCP tool within the MCP concurrency limit."""
+    async with _MCP_SEM:
+        return await tool.ainvoke(args)
+
+# ETags of the PRs seen so far, used to detect whether a PR has changed
+_PR_ETAGS = ETagCache()
+
+# MCP tool results keyed by (tool, owner, repo, PR number), each stored with
+# the PR ETag it was fetched under
+_RESULT_CACHE_SIZE = 128
+_RESULT_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+async def _get_pr(repo_owner: str, repo_name: str, pr_number: int) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Get a PR and its ETag with a conditional GitHub API request."""
+    token = os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN")
+    if not token:
+        return None, None
+    
+    url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/pulls/{pr_number}"
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github+json"
+    }
+    try:
+        if _shared_http_client is not None:
+            return await _PR_ETAGS.get(_shared_http_client, url, headers=headers)
+        async with httpx.AsyncClient(timeout=10) as client:
+            return await _PR_ETAGS.get(client, url, headers=headers)
+    except httpx.HTTPError:
+        # Without an ETag the result is simply fetched again
+        return None, None
+
+# Marks a PR ETag the caller has not resolved yet, as opposed to a PR without one
+_UNRESOLVED: Final[Any] = object()
+
+async def _get_pr_etag(repo_owner: str, repo_name: str, pr_number: int) -> Optional[str]:
+    """Get the current ETag of a PR with a conditional GitHub API request."""
+    _, etag = await _get_pr(repo_owner, repo_name, pr_number)
+    return etag
+
+async def get_pr_head_sha(repo_owner: str, repo_name: str, pr_number: int) -> Optional[str]:
+    """Get the SHA of a PR's head commit.
+    
+    Args:
+        repo_owner: The GitHub repository owner
+        repo_name: The GitHub repository name
+        pr_number: The PR number
+        
+    Returns:
+        The head commit SHA, or None if it could not be determined
+    """
+    pr, _ = await _get_pr(repo_owner, repo_name, pr_number)
+    if not isinstance(pr, dict):
+        return None
+    return (pr.get("head") or {}).get("sha")
+
+def create_mcp_client(mcp_path: str = DEFAULT_MCP_PATH) -> MultiServerMCPClient:
+    """Create a GitHub MCP client for the server binary at `mcp_path`."""
+    return MultiServerMCPClient(
+        {
+            "github": {
+                "command": mcp_path,
+                "args": ["stdio"],
+                "env": {
+                    "GITHUB_PERSONAL_ACCESS_TOKEN": os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN", ""),
+                    "GITHUB_TOOLSETS": "repos,issues,pull_requests,code_security"
+                }
+            }
+        }
+    )
+
+def set_shared_clients(http_client: Optional[httpx.AsyncClient] = None) -> None:
+    """Register a long-lived HTTP client for direct GitHub API requests.
+    
+    Args:
+        http_client: The HTTP client, or None to go back to per-call clients
+    """
+    global _shared_http_client
+    _shared_http_client = http_client
+
+async def get_shared_mcp_client(mcp_path: str = DEFAULT_MCP_PATH) -> MultiServerMCPClient:
+    """Get the shared MCP client for a server binary, starting it on first use.
+    
+    Args:
+        mcp_path: Path to the GitHub MCP server executable
+        
+    Returns:
+        The started MCP client
+    """
+    client = _shared_mcp_clients.get(mcp_path)
+    if client is not None:
+        return client
+    
+    async with _MCP_LOCK:
+        client = _shared_mcp_clients.get(mcp_path)
+        if client is None:
+            started: asyncio.Future = asyncio.get_running_loop().create_future()
+            stop = asyncio.Event()
+            owner = asyncio.create_task(_hold_mcp_client(create_mcp_client(mcp_path), started, stop))
+            client = await started
+            _shared_mcp_clients[mcp_path] = client
+            _mcp_client_owners[mcp_path] = (owner, stop)
+    return client
+
+async def _hold_mcp_client(client: MultiServerMCPClient, started: asyncio.Future, stop: asyncio.Event) -> None:
+    """Keep an MCP client open until `stop` is set.
+    
+    The stdio client's task group must be entered and exited by the same task, so
+    the client is opened and closed here rather than by whichever tasks first use
+    it and later shut it down.
+    
+    Args:
+        client: The MCP client to open
+        started: Resolved with the client once it is open, or with the error if it cannot start
+        stop: Set to close the client
+    """
+    try:
+        async with client:
+            started.set_result(client)
+            await stop.wait()
+    except BaseException as e:
+        if not started.done():
+            started.set_exception(e)
+            return
+        raise
+
+async def get_shared_mcp_tools(mcp_path: str = DEFAULT_MCP_PATH) -> Dict[str, BaseTool]:
+    """Get the tools of the shared MCP client, indexed by name.
+    
+    Args:
+        mcp_path: Path to the GitHub MCP server executable
+        
+    Returns:
+        The MCP tools keyed by their name
+    """
+    tool_index = _shared_mcp_tools.get(mcp_path)
+    if tool_index is None:
+        client = await get_shared_mcp_client(mcp_path)
+        tool_index = _shared_mcp_tools[mcp_path] = {tool.name: tool for tool in client.get_tools()}
+    return tool_index
+
+def pick_tool(tool_index: Dict[str, BaseTool], names: List[str]) -> Optional[BaseTool]:
+    """Pick the first of the candidate tool names the MCP server provides.
+    
+    Args:
+        tool_index: The MCP tools keyed by their name
+        names: Candidate tool names, in order of preference
+        
+    Returns:
+        The matching tool, or None if the server provides none of them
+    """
+    return next((tool_index[name] for name in names if name in tool_index), None)
+
+async def close_shared_mcp_clients() -> None:
+    """Stop all shared MCP clients."""
+    async with _MCP_LOCK:
+        owners = list(_mcp_client_owners.values())
+        _mcp_client_owners.clear()
+        _shared_mcp_clients.clear()
+        _shared_mcp_tools.clear()
+    for owner, stop in owners:
+        stop.set()
+    # Each client is closed by the task that opened it
+    await asyncio.gather(*(owner for owner, _ in owners), return_exceptions=True)
+
+async def resolve_latest_pr_number(repo_owner: str, repo_name: str, mcp_path: str = DEFAULT_MCP_PATH) -> Optional[int]:
+    """Get the number of the most recently created open PR.
+    
+    Args:
+        repo_owner: The GitHub repository owner
+        repo_name: The GitHub repository name
+        mcp_path: Path to the GitHub MCP server executable
+        
+    Returns:
+        The PR number, or None if no list tool is available or there are no open PRs
+    """
+    tool_index = await get_shared_mcp_tools(mcp_path)
+    
+    # Try to find a tool to list PRs
+    list_tool = pick_tool(tool_index, ["list_prs", "list_pull_requests", "get_pulls"])
+    if not list_tool:
+        return None
+    
+    # Get the latest PR
+    prs_result = await _invoke_mcp_tool(list_tool, {
+        "owner": repo_owner,
+        "repo": repo_name,
+        "state": "open",
+        "sort": "created",
+        "direction": "desc",
+        "per_page": 1
+    })
+    
+    # Handle different response formats
+    if isinstance(prs_result, dict) and "data" in prs_result and prs_result["data"]:
+        return prs_result["data"][0]["number"]
+    if isinstance(prs_result, list) and prs_result:
+        return prs_result[0]["number"]
+    return None
+
+# Demo payloads returned when the GitHub MCP server is unavailable; callers
+# get deep copies of them, so no caller can alter them for later calls
+_MOCK_PR: Final[Mapping[str, Any]] = MappingProxyType({
+    "number": 1234,
+    "title": "Demo PR for testing",
+    "body": "This is a mock PR created for testing purposes since the GitHub MCP tools were not available.",
+    "user": {"login": "demo-user"},
+    "commits": [{"commit": {"message": "Demo commit"}}],
+    "created_at": "2023-01-01T00:00:00Z",
+    "updated_at": "2023-01-01T00:00:00Z",
+    "state": "open"
+})
+
+_MOCK_FILES: Final[List[Dict[str, Any]]] = [
+    {"filename": "README.md", "status": "modified", "additions": 10, "deletions": 5},
+    {"filename": "src/main.py", "status": "added", "additions": 50, "deletions": 0},
+    {"filename": "tests/test_main.py", "status": "modified", "additions": 20, "deletions": 10}
+]
+
+_MOCK_DIFF: Final[str] = """diff --git a/README.md b/README.md
+index 1234567..abcdefg 100644
+--- a/README.md
++++ b/README.md
+@@ -1,5 +1,10 @@
+ # Demo Project
+-This is a demo project.
++This is a demo project with updated documentation.
++
++## Features
++- Feature 1
++- Feature 2
++- Feature 3
+ 
+ ## Installation
+ Instructions for installation."""
+
+# Errors expected when the MCP server is slow, unreachable or rejects a call;
+# OSError also covers connection errors and a server that cannot be started.
+# Anything else is a bug and is raised rather than masked by a mock payload
+_MCP_ERRORS = (asyncio.TimeoutError, ToolException, OSError)
+
+@functools.lru_cache(maxsize=8)
+def _mcp_available(mcp_path: str) -> bool:
+    """Check once per server binary whether the GitHub MCP server can be used at all."""
+    if not os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN"):
+        logger.warning("GITHUB_PERSONAL_ACCESS_TOKEN is not set, using mock PR data")
+        return False
+    if not os.path.exists(mcp_path):
+        logger.warning("GitHub MCP server not found at %s, using mock PR data", mcp_path)
+        return False
+    return True
+
+def _mock_pr(pr_number: Optional[int] = None) -> Dict[str, Any]:
+    """Get a copy of the mock PR, numbered like the requested PR if there is one."""
+    mock = copy.deepcopy(dict(_MOCK_PR))
+    if pr_number:
+        mock["number"] = pr_number
+    return mock
+
+def _mock_files() -> List[Dict[str, Any]]:
+    """Get a copy of the mock changed files."""
+    return copy.deepcopy(_MOCK_FILES)
+
+def mcp_tool_with_fallback(mock: Any):
+    """Make a tool's `_arun` return a mock payload when the MCP server is unavailable or fails.
+    
+    Args:
+        mock: The payload to return, or a callable taking the tool and returning it
+        
+    Returns:
+        The decorator
+    """
+    def decorator(arun):
+        @functools.wraps(arun)
+        async def wrapper(self, *args, **kwargs):
+            if not _mcp_available(self.mcp_path):
+                return mock(self) if callable(mock) else mock
+            try:
+                return await arun(self, *args, **kwargs)
+            except _MCP_ERRORS as e:
+                logger.exception("Error in %s: %s", type(self).__name__, e)
+                return mock(self) if callable(mock) else mock
+        return wrapper
+    return decorator
+
 class GitHubMCPTool(BaseTool):
     """Base class for GitHub MCP tools."""
     
@@ -29,21 +347,29 @@ class GitHubMCPTool(BaseTool):
         """Synchronous run method required by BaseTool."""
         raise NotImplementedError("This tool only supports async execution.")
     
-    async def _get_mcp_client(self):
-        """Get a GitHub MCP client."""
-        return MultiServerMCPClient(
-            {
-                "github": {
-                    "command": self.mcp_path,
-                    "args": ["stdio"],
-                    "env": {
-                        "GITHUB_PERSONAL_ACCESS_TOKEN": os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN", ""),
-                        "GITHUB_TOOLSETS": "repos,issues,pull_requests,code_security"
-                    }
-                }
-            }
-        )
-
+    async def _fetch_if_changed(self, pr_number: int, fetch: Callable[[], Awaitable[Any]], pr_etag: Any = _UNRESOLVED) -> Any:
+        """Return the cached result of `fetch` unless the PR changed since it was fetched.
+        
+        Args:
+            pr_number: The PR number
+            fetch: Fetches the result
+            pr_etag: The PR's current ETag, if the caller already resolved it
+        """
+        key = (self.name, self.repo_owner, self.repo_name, pr_number)
+        etag = await _get_pr_etag(self.repo_owner, self.repo_name, pr_number) if pr_etag is _UNRESOLVED else pr_etag
+        cached = _RESULT_CACHE.get(key)
+        if etag and cached and cached[0] == etag:
+            _RESULT_CACHE.move_to_end(key)
+            return cached[1]
+        
+        result = await fetch()
+        if etag:
+            _RESULT_CACHE[key] = (etag, result)
+            _RESULT_CACHE.move_to_end(key)
+            while len(_RESULT_CACHE) > _RESULT_CACHE_SIZE:
+                _RESULT_CACHE.popitem(last=False)
+        return result
+    
 class GetPRTool(GitHubMCPTool):
     """Tool for retrieving PR information using GitHub MCP."""
     
@@ -56,110 +382,30 @@ class GetPRTool(GitHubMCPTool):
         """Synchronous run method required by BaseTool."""
         raise NotImplementedError("This tool only supports async execution.")
     
-    async def _arun(self, run_manager: Optional[CallbackManagerForToolRun] = None) -> Dict[str, Any]:
+    @mcp_tool_with_fallback(lambda tool: _mock_pr(tool.pr_number))
+    async def _arun(self, run_manager: Optional[CallbackManagerForToolRun] = None, pr_etag: Any = _UNRESOLVED) -> Dict[str, Any]:
         """Run the tool asynchronously."""
-        try:
-            async with await self._get_mcp_client() as client:
-                tools = client.get_tools()
-                available_tools = [tool.name for tool in tools]
-                print(f"Available GitHub MCP tools: {available_tools}")
-                
-                # First check if we need to get the latest PR number
-                pr_number = self.pr_number
-                if not pr_number:
-                    # Try to find a tool to list PRs
-                    list_tool_names = ["list_prs", "list_pull_requests", "get_pulls"]
-                    list_tool = None
-                    
-                    for tool_name in list_tool_names:
-                        if tool_name in available_tools:
-                            list_tool = next(tool for tool in tools if tool.name == tool_name)
-                            break
-                    
-                    if not list_tool:
-                        # Fallback to a mock PR for demo purposes
-                        return {
-                            "number": 1234,
-                            "title": "Demo PR for testing",
-                            "body": "This is a mock PR created for testing purposes since MCP tools were not available.",
-                            "user": {"login": "demo-user"},
-                            "commits": [{"commit": {"message": "Demo commit"}}],
-                            "created_at": "2023-01-01T00:00:00Z",
-                            "updated_at": "2023-01-01T00:00:00Z",
-                            "state": "open"
-                        }
-                    
-                    # Get the latest PR
-                    prs_result = await list_tool.ainvoke({
-                        "owner": self.repo_owner,
-                        "repo": self.repo_name,
-                        "state": "open",
-                        "sort": "created",
-                        "direction": "desc",
-                        "per_page": 1
-                    })
-                    
-                    # Handle different response formats
-                    if isinstance(prs_result, dict) and "data" in prs_result and prs_result["data"]:
-                        pr_number = prs_result["data"][0]["number"]
-                    elif isinstance(prs_result, list) and prs_result:
-                        pr_number = prs_result[0]["number"]
-                    else:
-                        # Fallback to a mock PR
-                        return {
-                            "number": 1234,
-                            "title": "Demo PR for testing",
-                            "body": "This is a mock PR created for testing purposes since no open PRs were found.",
-                            "user": {"login": "demo-user"},
-                            "commits": [{"commit": {"message": "Demo commit"}}],
-                            "created_at": "2023-01-01T00:00:00Z",
-                            "updated_at": "2023-01-01T00:00:00Z",
-                            "state": "open"
-                        }
-                
-                # Now try to get the PR details
-                pr_tool_names = ["get_pr", "get_pull_request", "get_pull"]
-                pr_tool = None
-                
-                for tool_name in pr_tool_names:
-                    if tool_name in available_tools:
-                        pr_tool = next(tool for tool in tools if tool.name == tool_name)
-                        break
-                
-                if not pr_tool:
-                    # Fallback to a mock PR
-                    return {
-                        "number": pr_number or 1234,
-                        "title": "Demo PR for testing",
-                        "body": "This is a mock PR created for testing purposes since MCP tools were not available.",
-                        "user": {"login": "demo-user"},
-                        "commits": [{"commit": {"message": "Demo commit"}}],
-                        "created_at": "2023-01-01T00:00:00Z",
-                        "updated_at": "2023-01-01T00:00:00Z",
-                        "state": "open"
-                    }
-                
-                # Get the PR details
-                result = await pr_tool.ainvoke({
-                    "owner": self.repo_owner,
-                    "repo": self.repo_name,
-                    "pull_number": pr_number
-                })
-                
-                return result
-        except Exception as e:
-            print(f"Error in GetPRTool: {str(e)}")
-            # Return a mock PR for demo purposes
-            return {
-                "number": self.pr_number or 1234,
-                "title": "Demo PR for testing",
-                "body": "This is a mock PR created for testing purposes due to an error: " + str(e),
-                "user": {"login": "demo-user"},
-                "commits": [{"commit": {"message": "Demo commit"}}],
-                "created_at": "2023-01-01T00:00:00Z",
-                "updated_at": "2023-01-01T00:00:00Z",
-                "state": "open"
-            }
+        tool_index = await get_shared_mcp_tools(self.mcp_path)
+        logger.debug("Available GitHub MCP tools: %s", list(tool_index))
+        
+        # First check if we need to get the latest PR number
+        pr_number = self.pr_number or await resolve_latest_pr_number(self.repo_owner, self.repo_name, self.mcp_path)
+        if not pr_number:
+            # Fallback to a mock PR for demo purposes
+            return _mock_pr()
+        
+        # Now try to get the PR details
+        pr_tool = pick_tool(tool_index, ["get_pr", "get_pull_request", "get_pull"])
+        if not pr_tool:
+            # Fallback to a mock PR
+            return _mock_pr(pr_number)
+        
+        # Get the PR details
+        return await self._fetch_if_changed(pr_number, lambda: _invoke_mcp_tool(pr_tool, {
+            "owner": self.repo_owner,
+            "repo": self.repo_name,
+            "pull_number": pr_number
+        }), pr_etag)
 
 class GetPRFilesTool(GitHubMCPTool):
     """Tool for retrieving files changed in a PR using GitHub MCP."""
@@ -173,90 +419,27 @@ class GetPRFilesTool(GitHubMCPTool):
         """Synchronous run method required by BaseTool."""
         raise NotImplementedError("This tool only supports async execution.")
     
-    async def _arun(self, run_manager: Optional[CallbackManagerForToolRun] = None) -> List[Dict[str, Any]]:
+    @mcp_tool_with_fallback(lambda tool: _mock_files())
+    async def _arun(self, run_manager: Optional[CallbackManagerForToolRun] = None, pr_etag: Any = _UNRESOLVED) -> List[Dict[str, Any]]:
         """Run the tool asynchronously."""
-        try:
-            async with await self._get_mcp_client() as client:
-                tools = client.get_tools()
-                available_tools = [tool.name for tool in tools]
-                print(f"Available GitHub MCP tools for files: {available_tools}")
-                
-                # First check if we need to get the latest PR number
-                pr_number = self.pr_number
-                if not pr_number:
-                    # Try to find a tool to list PRs
-                    list_tool_names = ["list_prs", "list_pull_requests", "get_pulls"]
-                    list_tool = None
-                    
-                    for tool_name in list_tool_names:
-                        if tool_name in available_tools:
-                            list_tool = next(tool for tool in tools if tool.name == tool_name)
-                            break
-                    
-                    if not list_tool:
-                        # Fallback to mock files for demo purposes
-                        return [
-                            {"filename": "README.md", "status": "modified", "additions": 10, "deletions": 5},
-                            {"filename": "src/main.py", "status": "added", "additions": 50, "deletions": 0},
-                            {"filename": "tests/test_main.py", "status": "modified", "additions": 20, "deletions": 10}
-                        ]
-                    
-                    # Get the latest PR
-                    prs_result = await list_tool.ainvoke({
-                        "owner": self.repo_owner,
-                        "repo": self.repo_name,
-                        "state": "open",
-                        "sort": "created",
-                        "direction": "desc",
-                        "per_page": 1
-                    })
-                    
-                    # Handle different response formats
-                    if isinstance(prs_result, dict) and "data" in prs_result and prs_result["data"]:
-                        pr_number = prs_result["data"][0]["number"]
-                    elif isinstance(prs_result, list) and prs_result:
-                        pr_number = prs_result[0]["number"]
-                    else:
-                        # Fallback to mock files
-                        return [
-                            {"filename": "README.md", "status": "modified", "additions": 10, "deletions": 5},
-                            {"filename": "src/main.py", "status": "added", "additions": 50, "deletions": 0},
-                            {"filename": "tests/test_main.py", "status": "modified", "additions": 20, "deletions": 10}
-                        ]
-                
-                # Now try to get the PR files
-                files_tool_names = ["get_pr_files", "get_pull_files", "list_pull_files"]
-                files_tool = None
-                
-                for tool_name in files_tool_names:
-                    if tool_name in available_tools:
-                        files_tool = next(tool for tool in tools if tool.name == tool_name)
-                        break
-                
-                if not files_tool:
-                    # Fallback to mock files
-                    return [
-                        {"filename": "README.md", "status": "modified", "additions": 10, "deletions": 5},
-                        {"filename": "src/main.py", "status": "added", "additions": 50, "deletions": 0},
-                        {"filename": "tests/test_main.py", "status": "modified", "additions": 20, "deletions": 10}
-                    ]
-                
-                # Get the PR files
-                result = await files_tool.ainvoke({
-                    "owner": self.repo_owner,
-                    "repo": self.repo_name,
-                    "pull_number": pr_number
-                })
-                
-                return result
-        except Exception as e:
-            print(f"Error in GetPRFilesTool: {str(e)}")
-            # Return mock files for demo purposes
-            return [
-                {"filename": "README.md", "status": "modified", "additions": 10, "deletions": 5},
-                {"filename": "src/main.py", "status": "added", "additions": 50, "deletions": 0},
-                {"filename": "tests/test_main.py", "status": "modified", "additions": 20, "deletions": 10}
-            ]
+        tool_index = await get_shared_mcp_tools(self.mcp_path)
+        logger.debug("Available GitHub MCP tools for files: %s", list(tool_index))
+        
+        # First check if we need to get the latest PR number
+        pr_number = self.pr_number or await resolve_latest_pr_number(self.repo_owner, self.repo_name, self.mcp_path)
+        
+        # Now try to get the PR files
+        files_tool = pick_tool(tool_index, ["get_pr_files", "get_pull_files", "list_pull_files"])
+        if not pr_number or not files_tool:
+            # Fallback to mock files for demo purposes
+            return _mock_files()
+        
+        # Get the PR files
+        return await self._fetch_if_changed(pr_number, lambda: _invoke_mcp_tool(files_tool, {
+            "owner": self.repo_owner,
+            "repo": self.repo_name,
+            "pull_number": pr_number
+        }), pr_etag)
 
 class GetPRDiffTool(GitHubMCPTool):
     """Tool for retrieving the diff of a PR using GitHub MCP."""
@@ -270,145 +453,70 @@ class GetPRDiffTool(GitHubMCPTool):
         """Synchronous run method required by BaseTool."""
         raise NotImplementedError("This tool only supports async execution.")
     
-    async def _arun(self, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+    @mcp_tool_with_fallback(_MOCK_DIFF)
+    async def _arun(self, run_manager: Optional[CallbackManagerForToolRun] = None, pr_etag: Any = _UNRESOLVED) -> str:
         """Run the tool asynchronously."""
-        try:
-            async with await self._get_mcp_client() as client:
-                tools = client.get_tools()
-                available_tools = [tool.name for tool in tools]
-                print(f"Available GitHub MCP tools for diff: {available_tools}")
-                
-                # First check if we need to get the latest PR number
-                pr_number = self.pr_number
-                if not pr_number:
-                    # Try to find a tool to list PRs
-                    list_tool_names = ["list_prs", "list_pull_requests", "get_pulls"]
-                    list_tool = None
-                    
-                    for tool_name in list_tool_names:
-                        if tool_name in available_tools:
-                            list_tool = next(tool for tool in tools if tool.name == tool_name)
-                            break
-                    
-                    if not list_tool:
-                        # Fallback to mock diff for demo purposes
-                        return """diff --git a/README.md b/README.md
-index 1234567..abcdefg 100644
---- a/README.md
-+++ b/README.md
-@@ -1,5 +1,10 @@
- # Demo Project
--This is a demo project.
-+This is a demo project with updated documentation.
-+
-+## Features
-+- Feature 1
-+- Feature 2
-+- Feature 3
- 
- ## Installation
- Instructions for installation."""
-                    
-                    # Get the latest PR
-                    prs_result = await list_tool.ainvoke({
-                        "owner": self.repo_owner,
-                        "repo": self.repo_name,
-                        "state": "open",
-                        "sort": "created",
-                        "direction": "desc",
-                        "per_page": 1
-                    })
-                    
-                    # Handle different response formats
-                    if isinstance(prs_result, dict) and "data" in prs_result and prs_result["data"]:
-                        pr_number = prs_result["data"][0]["number"]
-                    elif isinstance(prs_result, list) and prs_result:
-                        pr_number = prs_result[0]["number"]
-                    else:
-                        # Fallback to mock diff
-                        return """diff --git a/README.md b/README.md
-index 1234567..abcdefg 100644
---- a/README.md
-+++ b/README.md
-@@ -1,5 +1,10 @@
- # Demo Project
--This is a demo project.
-+This is a demo project with updated documentation.
-+
-+## Features
-+- Feature 1
-+- Feature 2
-+- Feature 3
- 
- ## Installation
- Instructions for installation."""
-                
-                # Now try to get the PR diff
-                diff_tool_names = ["get_pr_diff", "get_pull_diff", "get_diff"]
-                diff_tool = None
-                
-                for tool_name in diff_tool_names:
-                    if tool_name in available_tools:
-                        diff_tool = next(tool for tool in tools if tool.name == tool_name)
-                        break
-                
-                if not diff_tool:
-                    # Fallback to mock diff
-                    return """diff --git a/README.md b/README.md
-index 1234567..abcdefg 100644
---- a/README.md
-+++ b/README.md
-@@ -1,5 +1,10 @@
- # Demo Project
--This is a demo project.
-+This is a demo project with updated documentation.
-+
-+## Features
-+- Feature 1
-+- Feature 2
-+- Feature 3
- 
- ## Installation
- Instructions for installation."""
-                
-                # Get the PR diff
-                result = await diff_tool.ainvoke({
-                    "owner": self.repo_owner,
-                    "repo": self.repo_name,
-                    "pull_number": pr_number
-                })
-                
-                return result
-        except Exception as e:
-            print(f"Error in GetPRDiffTool: {str(e)}")
-            # Return mock diff for demo purposes
-            return """diff --git a/README.md b/README.md
-index 1234567..abcdefg 100644
---- a/README.md
-+++ b/README.md
-@@ -1,5 +1,10 @@
- # Demo Project
--This is a demo project.
-+This is a demo project with updated documentation.
-+
-+## Features
-+- Feature 1
-+- Feature 2
-+- Feature 3
- 
- ## Installation
- Instructions for installation."""
+        tool_index = await get_shared_mcp_tools(self.mcp_path)
+        logger.debug("Available GitHub MCP tools for diff: %s", list(tool_index))
+        
+        # First check if we need to get the latest PR number
+        pr_number = self.pr_number or await resolve_latest_pr_number(self.repo_owner, self.repo_name, self.mcp_path)
+        
+        # Now try to get the PR diff
+        diff_tool = pick_tool(tool_index, ["get_pr_diff", "get_pull_diff", "get_diff"])
+        if not pr_number or not diff_tool:
+            # Fallback to mock diff for demo purposes
+            return _MOCK_DIFF
+        
+        # Get the PR diff
+        return await self._fetch_if_changed(pr_number, lambda: _invoke_mcp_tool(diff_tool, {
+            "owner": self.repo_owner,
+            "repo": self.repo_name,
+            "pull_number": pr_number
+        }), pr_etag)
 
 
 # Function to get all GitHub tools
 def get_github_tools(repo_owner: str = DEFAULT_REPO_OWNER, 
                     repo_name: str = DEFAULT_REPO_NAME,
                     pr_number: Optional[int] = None,
-                    mcp_path: str = "/home/srihari/Documents/GEnAi/githubmcp/github-mcp-server/github-mcp-server"):
+                    mcp_path: str = DEFAULT_MCP_PATH):
     """Get all GitHub tools."""
-    print(f"Initializing GitHub tools for {repo_owner}/{repo_name}, PR #{pr_number if pr_number else 'latest'}")
+    logger.debug("Initializing GitHub tools for %s/%s, PR #%s", repo_owner, repo_name, pr_number or "latest")
     return [
         GetPRTool(repo_owner=repo_owner, repo_name=repo_name, pr_number=pr_number, mcp_path=mcp_path),
         GetPRFilesTool(repo_owner=repo_owner, repo_name=repo_name, pr_number=pr_number, mcp_path=mcp_path),
         GetPRDiffTool(repo_owner=repo_owner, repo_name=repo_name, pr_number=pr_number, mcp_path=mcp_path)
     ]
+
+async def fetch_pr_bundle(repo_owner: str = DEFAULT_REPO_OWNER,
+                          repo_name: str = DEFAULT_REPO_NAME,
+                          pr_number: Optional[int] = None,
+                          mcp_path: str = DEFAULT_MCP_PATH) -> Tuple[Dict[str, Any], Any, Any]:
+    """Fetch a PR's info, changed files and diff in one concurrent round-trip.
+    
+    Args:
+        repo_owner: The GitHub repository owner
+        repo_name: The GitHub repository name
+        pr_number: Optional PR number to fetch. If None, fetches the latest PR.
+        mcp_path: Path to the GitHub MCP server executable
+        
+    Returns:
+        The PR info, the changed files and the diff
+    """
+    # Resolve the latest PR once instead of in each of the three tools
+    if not pr_number and _mcp_available(mcp_path):
+        try:
+            pr_number = await resolve_latest_pr_number(repo_owner, repo_name, mcp_path)
+        except _MCP_ERRORS as e:
+            # Each tool falls back on its own if the PR cannot be resolved
+            logger.exception("Error resolving the latest PR: %s", e)
+    
+    # The PR's ETag is likewise looked up once and shared by the three tools
+    pr_etag = _UNRESOLVED
+    if pr_number and _mcp_available(mcp_path):
+        pr_etag = await _get_pr_etag(repo_owner, repo_name, pr_number)
+    
+    github_tools = get_github_tools(repo_owner=repo_owner, repo_name=repo_name, pr_number=pr_number, mcp_path=mcp_path)
+    pr_info, pr_files, pr_diff = await asyncio.gather(*(tool._arun(pr_etag=pr_etag) for tool in github_tools))
+    return pr_info, pr_files, pr_diff
@@ -0,0 +1,270 @@
+"""
+LLM helper tools for PR review system.
+Caches chat model instances and shares a concurrency limit across all agent
+model calls so fanned-out prompts do not exceed the provider's rate limits.
+"""
+
+import asyncio
+import functools
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+import orjson
+from langchain.chat_models import init_chat_model
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
+
+# Maximum number of LLM requests in flight at once, across all agents
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+_LLM_SEMAPHORE = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# Shared by every review stage so all prompts for a PR start with the same
+# prefix (system prompt + output schema + PR data) and can hit the
+# provider's prompt cache
+REVIEW_SYSTEM_PROMPT = (
+    "You are part of an automated GitHub pull request review system. "
+    "The PR under review is provided between <PR_DATA> tags and your "
+    "instructions for this step are provided between <TASK> tags."
+)
+
+# Review conventions and the output formats of every stage, shared by all
+# prompts so the static prefix is identical across stages and PRs; each task
+# only names the format it wants
+REVIEW_OUTPUT_SCHEMA = """Review conventions:
+- Base every statement on the PR data. Do not speculate about code that is not shown.
+- Refer to files by their path as it appears in the diff, e.g. "src/app/main.py".
+- Line numbers refer to the new version of the file, taken from the hunk headers
+  ("@@ -old,count +new,count @@") and counted from there; use null if a finding
+  does not apply to a single line.
+- Files listed in "skipped_files" were left out of the diff on purpose (binary,
+  generated, lock files and test fixtures). Do not report them as missing.
+- Risky practices are changes that can break production or compromise security:
+  injection, hard-coded secrets, unsafe deserialization, missing input validation,
+  race conditions, swallowed exceptions, resource leaks and breaking API changes.
+- Code quality issues are maintainability problems: duplication, unclear naming,
+  dead code, overly long functions, missing error handling and missing tests.
+- Keep every description to one or two sentences and say why it matters.
+- Do not report the same finding twice, and do not praise unchanged code.
+
+Output formats:
+- SUMMARY: a JSON object {"summary": string}, a concise summary of the changes.
+- ISSUES: a JSON object {"risky_practices": [FINDING], "code_quality_issues": [FINDING]}.
+- FILE_ANALYSIS: a JSON object {"summary": string, "risky_practices": [FINDING],
+  "code_quality_issues": [FINDING]} covering a single file of the PR.
+- REVIEW_COMMENTS: a JSON object {"file_comments": [COMMENT], "general_comments": [string]}.
+- FINDING: a JSON object {"file": string, "line": integer or null, "description": string}.
+- COMMENT: a JSON object {"file": string, "line": integer or null, "comment": string},
+  with a concrete suggestion or fix where there is one.
+- MARKDOWN: a well-structured markdown document, not wrapped in a code block.
+
+When a JSON format is requested, respond with the JSON object only: no code
+fences and no text before or after it. Use empty lists rather than omitting
+fields."""
+
+# Static messages are passed to the templates as message objects, so they
+# are reused as-is instead of being re-rendered on every call
+_REVIEW_SYSTEM_MESSAGE = SystemMessage(content=REVIEW_SYSTEM_PROMPT)
+_REVIEW_SCHEMA_MESSAGE = SystemMessage(content=REVIEW_OUTPUT_SCHEMA)
+
+
+@dataclass(frozen=True)
+class EscalationPolicy:
+    """Two-tier model routing: the fast model does the first pass and the
+    strong model is only used when that result looks unreliable or risky."""
+    
+    fast_model: str = "openai:gpt-4.1-mini"
+    strong_model: str = "openai:gpt-4.1"
+    # First-pass results reporting more risky practices than this are redone
+    max_risky_practices: int = 3
+    
+    @classmethod
+    def from_env(cls) -> "EscalationPolicy":
+        """Create the policy from the LLM_FAST_MODEL, LLM_STRONG_MODEL and
+        ESCALATION_RISK_THRESHOLD environment variables."""
+        return cls(
+            fast_model=os.getenv("LLM_FAST_MODEL", cls.fast_model),
+            strong_model=os.getenv("LLM_STRONG_MODEL", cls.strong_model),
+            max_risky_practices=int(os.getenv("ESCALATION_RISK_THRESHOLD", str(cls.max_risky_practices)))
+        )
+    
+    def should_escalate(self, result: Optional[Dict[str, Any]], risky_count: int = 0) -> bool:
+        """Decide whether a fast-model result has to be redone by the strong model.
+        
+        Args:
+            result: The parsed fast-model response, or None if it did not parse
+            risky_count: The number of risky practices the result reports
+            
+        Returns:
+            True if the strong model should be used
+        """
+        return result is None or risky_count > self.max_risky_practices
+
+
+DEFAULT_ESCALATION_POLICY = EscalationPolicy.from_env()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_http_client() -> httpx.AsyncClient:
+    """Get the HTTP client shared by all OpenAI chat models."""
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=32)
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def get_model(model_name: str) -> Any:
+    """Get a chat model, initializing it only on first use.
+
+    Args:
+        model_name: The name of the LLM model, e.g. "openai:gpt-4.1"
+
+    Returns:
+        The cached chat model instance
+    """
+    kwargs = {}
+    if model_name.startswith("openai:"):
+        # Reuse pooled keep-alive connections across calls and agents
+        kwargs["http_async_client"] = _get_http_client()
+    # Deterministic sampling keeps the response cache sound
+    return init_chat_model(model_name, temperature=0, **kwargs)
+
+
+def build_review_prompt(task: str) -> ChatPromptTemplate:
+    """Build the prompt template for a review stage with the PR data as a static prefix.
+
+    Templates are meant to be built once at import; ``{pr_data}`` and any
+    placeholders in ``task`` are filled in per call. The system message and,
+    if it has no placeholders, the task are rendered here once.
+
+    Args:
+        task: The stage-specific instructions, appended after the PR data
+
+    Returns:
+        The prompt template
+    """
+    task_message = HumanMessagePromptTemplate.from_template(f"<TASK>\n{task}\n</TASK>")
+    if not task_message.input_variables:
+        task_message = task_message.format()
+    
+    return ChatPromptTemplate.from_messages([
+        _REVIEW_SYSTEM_MESSAGE,
+        _REVIEW_SCHEMA_MESSAGE,
+        ("human", "<PR_DATA>\n{pr_data}\n</PR_DATA>"),
+        task_message
+    ])
+
+
+def format_review_messages(prompt: ChatPromptTemplate, model_name: str, **variables: str) -> List[BaseMessage]:
+    """Format a review stage prompt for the given model.
+
+    Args:
+        prompt: A template built with ``build_review_prompt``
+        model_name: The name of the LLM model the prompt is for
+        **variables: The template variables, including ``pr_data``
+
+    Returns:
+        The prompt messages
+    """
+    messages = prompt.format_messages(**variables)
+    if model_name.startswith("anthropic:"):
+        # Anthropic only caches prefixes that are explicitly marked: the
+        # static block is shared by every PR, the PR data by every stage
+        messages[1] = SystemMessage(content=[_cache_block(messages[1].content)])
+        messages[2] = HumanMessage(content=[_cache_block(messages[2].content)])
+    return messages
+
+
+def _cache_block(text: str) -> Dict[str, Any]:
+    """Wrap text in an Anthropic content block marked as a cache breakpoint."""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def _json_object_end(text: str, start: int, state: List[Any]) -> int:
+    """Scan streamed text for the end of the top-level JSON object.
+
+    ``state`` holds ``[depth, in_string, escaped]`` and is updated in place so
+    each streamed chunk is only scanned once.
+
+    Returns:
+        The index just past the closing brace, or -1 if it has not arrived yet
+    """
+    depth, in_string, escaped = state
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"' and depth:
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if not depth:
+                state[:] = [depth, in_string, escaped]
+                return index + 1
+    state[:] = [depth, in_string, escaped]
+    return -1
+
+
+async def ainvoke(model: Any, messages: List[BaseMessage], json_mode: bool = False) -> str:
+    """Invoke a chat model while respecting the shared concurrency limit.
+
+    The response is streamed. In JSON mode the stream is closed as soon as the
+    top-level object is complete, so the caller can parse it and move on
+    without waiting for any trailing prose or code fence.
+
+    Args:
+        model: The chat model to invoke
+        messages: The formatted prompt messages
+        json_mode: Whether the response is expected to be a JSON object
+
+    Returns:
+        The text content of the model response
+    """
+    text = ""
+    state = [0, False, False]
+    async with _LLM_SEMAPHORE:
+        stream = model.astream(messages)
+        try:
+            async for chunk in stream:
+                content = chunk.content
+                if isinstance(content, list):
+                    # Anthropic streams content blocks rather than plain text
+                    content = "".join(block.get("text", "") for block in content if isinstance(block, dict))
+                scanned = len(text)
+                text += content
+                if json_mode:
+                    end = _json_object_end(text, scanned, state)
+                    if end != -1:
+                        return text[:end]
+        finally:
+            await stream.aclose()
+    return text
+
+
+def parse_json_response(text: str) -> Optional[Dict[str, Any]]:
+    """Parse a JSON object from an LLM response, tolerating markdown code fences.
+
+    Args:
+        text: The raw response content
+
+    Returns:
+        The parsed object, or None if the response is not a JSON object
+    """
+    cleaned = text.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        parsed = orjson.loads(cleaned)
+    except orjson.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
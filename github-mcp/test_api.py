@@ -2,46 +2,31 @@
 Simple test script for GitHub PR Review API
 """
 
-import requests
-import json
+import asyncio
+from typing import Optional
 
-# API endpoint
-API_URL = "http://localhost:8000/review-pr"
+import httpx
+
+# API server
+API_BASE_URL = "http://localhost:8000"
+API_PATH = "/review-pr"
 
 # Test repository URL - change this to your target repository
 REPO_URL = "https://github.com/psf/black"
 
-# Optional PR number - set to None to use latest PR
-PR_NUMBER = None
-
-# Create the request payload
-payload = {
-    "repo_url": REPO_URL
-}
-
-if PR_NUMBER:
-    payload["pr_number"] = PR_NUMBER
-
-# Print what we're about to do
-print(f"Sending request to {API_URL}")
-print(f"Repository: {REPO_URL}")
-if PR_NUMBER:
-    print(f"PR Number: {PR_NUMBER}")
-else:
-    print("PR Number: Latest")
-
-try:
-    # Make the API request
-    response = requests.post(API_URL, json=payload)
-    
-    # Print status code
-    print(f"\nResponse Status: {response.status_code}")
-    
+# PR numbers to review - None reviews the latest PR; several PRs are
+# reviewed concurrently over the same keep-alive connections
+PR_NUMBERS = [None]
+
+def print_result(pr_number: Optional[int], response: httpx.Response) -> None:
+    """Print the outcome of one review request."""
+    print(f"\n[PR {pr_number or 'Latest'}] Response Status: {response.status_code}")
+
     # Check if request was successful
     if response.status_code == 200:
         # Get the response data
         result = response.json()
-        
+
         # Print a summary of the response
         print("\n=== PR Review Summary ===")
         print(f"Repository: {result['repo_owner']}/{result['repo_name']}")
@@ -52,6 +37,37 @@ try:
         # Print error information
         print("\nError Response:")
         print(response.text)
-except Exception as e:
-    print(f"\nError: {str(e)}")
-    print("\nMake sure the API server is running with: uvicorn api:app --reload")
+
+async def review(client: httpx.AsyncClient, pr_number: Optional[int]) -> httpx.Response:
+    """Request the review of one PR."""
+    # Create the request payload
+    payload = {
+        "repo_url": REPO_URL
+    }
+    if pr_number:
+        payload["pr_number"] = pr_number
+    return await client.post(API_PATH, json=payload)
+
+async def main() -> None:
+    # Print what we're about to do
+    print(f"Sending request to {API_BASE_URL}{API_PATH}")
+    print(f"Repository: {REPO_URL}")
+    print(f"PR Numbers: {', '.join(str(pr_number or 'Latest') for pr_number in PR_NUMBERS)}")
+
+    try:
+        # Reviews take a while, so the timeout is generous
+        async with httpx.AsyncClient(
+            base_url=API_BASE_URL,
+            timeout=httpx.Timeout(300.0),
+            limits=httpx.Limits(max_keepalive_connections=10)
+        ) as client:
+            responses = await asyncio.gather(*(review(client, pr_number) for pr_number in PR_NUMBERS))
+
+        for pr_number, response in zip(PR_NUMBERS, responses):
+            print_result(pr_number, response)
+    except httpx.HTTPError as e:
+        print(f"\nError: {str(e)}")
+        print("\nMake sure the API server is running with: python3 src/comms/server/api.py")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,13 +2,11 @@
 # Agent logic is currently in graph.py but can be moved here later if needed.
 
 from .pr_retriever_agent import pr_retriever_agent
-from .code_understanding_agent import code_understanding_agent
-from .pr_review_comment_agent import pr_review_comment_agent
+from .code_review_agent import code_review_agent
 from .supervisor_agent import supervisor_agent_compile_summary
 
 __all__ = [
     "pr_retriever_agent",
-    "code_understanding_agent",
-    "pr_review_comment_agent",
+    "code_review_agent",
     "supervisor_agent_compile_summary",
 ]
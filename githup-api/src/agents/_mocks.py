@@ -0,0 +1,23 @@
+import os
+
+# Canned agent outputs for demos and tests without GitHub/OpenAI access; only
+# returned when MOCK_MODE=1, so real runs do not carry them in their state
+MOCK_MODE = os.getenv("MOCK_MODE") == "1"
+
+MOCK_CODE_SUMMARY = "The changes in this pull request address a crash issue when formatting a backslash followed by a carriage return and a comment. The update modifies the regular expression in the `list_comments` function to correctly split lines on both `\\r\\n` and `\\r`. Additionally, new test cases are added to ensure proper handling of carriage return edge cases in the formatting logic."
+
+MOCK_IDENTIFIED_RISKS = ["No specific risks identified."]
+
+MOCK_COMMENT = "Hello,\n\nThank you for addressing the crash issue related to formatting a backslash followed by a carriage return and a comment. Your update to the regular expression in the `list_comments` function to handle both `\\r\\n` and `\\r` is well-considered and should effectively resolve the problem.\n\n### Code Summary\nThe modification to the regex pattern in `list_comments` is a straightforward and efficient solution. By splitting on `\\r?\\n|\\r`, you ensure that all line endings are correctly handled, which is crucial for maintaining the robustness of the formatting logic. The addition of test cases specifically targeting carriage return edge cases is an excellent approach to verify the fix and prevent regression.\n\n### Identified Risks\nWhile no specific risks were identified, it's always good practice to ensure that changes to regex patterns are thoroughly tested across various scenarios. The new test cases you've added do a great job of covering these edge cases.\n\n### Suggestions\n1. **Test Coverage:** Consider adding a few more test cases with mixed line endings in a single string to further ensure robustness.\n2. **Documentation:** It might be helpful to document this change in the code comments or in a developer's guide, explaining why this regex pattern was chosen, to assist future maintainers.\n\nOverall, this update is a valuable improvement to the codebase. Thank you for your attention to detail and for enhancing the reliability of the formatting logic.\n\nBest regards,\n[Your Name]"
+
+
+def mock_code_analysis() -> dict:
+    """Returns the code analysis fallback: the canned one in mock mode, otherwise an empty one."""
+    if MOCK_MODE:
+        return {"code_summary": MOCK_CODE_SUMMARY, "identified_risks": list(MOCK_IDENTIFIED_RISKS)}
+    return {"code_summary": "", "identified_risks": []}
+
+
+def mock_review_comments() -> dict:
+    """Returns the review comment fallback: the canned one in mock mode, otherwise an empty one."""
+    return {"generated_review_comments": MOCK_COMMENT if MOCK_MODE else ""}
@@ -0,0 +1,129 @@
+import json
+import logging
+from typing import Dict, Any, List
+
+from src.agents.supervisor_agent import supervisor_agent_compile_summary
+from src.configs.schema import PRReviewState
+from src.tools.github_tools import BatchGetPRInfoTool
+from src.tools.openai_tools import AnalyzeAndCommentTool, get_async_client, select_model
+from src.utils.github_url import parse_github_pr_url
+
+logger = logging.getLogger(__name__)
+
+# Batch states after which the batch will not change anymore
+_FINAL_BATCH_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchProcessor:
+    """
+    Reviews many PRs through the OpenAI Batch API, at half the cost of regular
+    requests and with up to 24 hours of turnaround. Meant for backlog sweeps where
+    latency does not matter.
+    """
+
+    def __init__(self):
+        self.reviewer = AnalyzeAndCommentTool()
+        self.github_tool = BatchGetPRInfoTool()
+        # PR metadata of the submitted batches, keyed by batch ID
+        self._batches: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    async def fetch_prs(self, pr_urls: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetches the PRs with batched GitHub GraphQL queries.
+        Returns the PR info keyed by "owner/repo#number"; invalid URLs and PRs
+        that could not be fetched are left out.
+        """
+        pull_requests = []
+        for pr_url in pr_urls:
+            parsed_url = parse_github_pr_url(pr_url)
+            if not parsed_url:
+                logger.warning(f"BatchProcessor: Skipping invalid GitHub PR URL: {pr_url}")
+                continue
+            pull_requests.append(parsed_url)
+
+        try:
+            return await self.github_tool._arun(list(dict.fromkeys(pull_requests)))
+        except Exception as e:
+            logger.error(f"BatchProcessor: Error retrieving PR info: {e}")
+            return {}
+
+    def build_requests(self, prs: Dict[str, Dict[str, Any]]) -> bytes:
+        """
+        Builds the batch input file: one review request per PR, identified by its PR key.
+        """
+        lines = []
+        for pr_key, pr_info in prs.items():
+            lines.append(json.dumps({
+                "custom_id": pr_key,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": select_model(pr_info["pr_diff"], self.reviewer.model),
+                    "messages": self.reviewer.build_messages(pr_info["pr_diff"]),
+                    "max_tokens": self.reviewer.max_tokens,
+                    "temperature": self.reviewer.temperature,
+                    "response_format": self.reviewer.response_format,
+                },
+            }))
+        return "\n".join(lines).encode()
+
+    async def submit(self, pr_urls: List[str]) -> Dict[str, Any]:
+        """
+        Fetches the PRs and submits their review prompts as one batch.
+        Returns the batch ID and status, and the PRs that were included.
+        """
+        prs = await self.fetch_prs(pr_urls)
+        if not prs:
+            raise ValueError("None of the PRs could be retrieved.")
+
+        client = get_async_client()
+        input_file = await client.files.create(file=("pr_reviews.jsonl", self.build_requests(prs)), purpose="batch")
+        batch = await client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"BatchProcessor: Submitted batch {batch.id} for {len(prs)} PRs")
+
+        self._batches[batch.id] = prs
+        return {"batch_id": batch.id, "status": batch.status, "prs": list(prs)}
+
+    async def results(self, batch_id: str) -> Dict[str, Any]:
+        """
+        Returns the status of a batch and, once it has completed, the final review
+        of each of its PRs.
+        """
+        prs = self._batches.get(batch_id)
+        if prs is None:
+            raise KeyError(batch_id)
+
+        client = get_async_client()
+        batch = await client.batches.retrieve(batch_id)
+        if batch.status not in _FINAL_BATCH_STATES:
+            return {"batch_id": batch_id, "status": batch.status, "reviews": []}
+
+        outputs: Dict[str, str] = {}
+        if batch.output_file_id:
+            content = await client.files.content(batch.output_file_id)
+            for line in content.text.splitlines():
+                result = json.loads(line)
+                response = result.get("response") or {}
+                if response.get("status_code") == 200:
+                    outputs[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+
+        reviews = []
+        for pr_key, pr_info in prs.items():
+            review = outputs.get(pr_key)
+            if review is None:
+                logger.warning(f"BatchProcessor: No result for {pr_key} in batch {batch_id}")
+                continue
+            state = PRReviewState(**pr_info, **self.reviewer.parse_response(review))
+            reviews.append({
+                "pr_title": pr_info["pr_title"],
+                "pr_url": pr_info["pr_url"],
+                "review_summary": supervisor_agent_compile_summary(state)["final_review_summary"],
+            })
+
+        # Finished batches are not polled again
+        self._batches.pop(batch_id, None)
+        return {"batch_id": batch_id, "status": batch.status, "reviews": reviews}
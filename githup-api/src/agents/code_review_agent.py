@@ -0,0 +1,43 @@
+import logging
+import os
+from typing import Dict, Any
+
+from langgraph.config import get_stream_writer
+
+from src.configs.schema import PRReviewState
+from src.tools.openai_tools import AnalyzeAndCommentTool
+from src.agents._mocks import mock_code_analysis, mock_review_comments
+
+logger = logging.getLogger(__name__)
+code_review_tool = AnalyzeAndCommentTool()
+
+async def code_review_agent(state: PRReviewState) -> Dict[str, Any]:
+    logger.info("Agent: code_review_agent - Processing code analysis and review comment generation")
+
+    # Check if we have a PR diff to review
+    if not state.pr_diff:
+        logger.warning("Agent: code_review_agent - No PR diff available for review")
+        # Fall back to the mock analysis and comments (empty unless MOCK_MODE=1)
+        return {**mock_code_analysis(), **mock_review_comments()}
+
+    # If OPENAI_API_KEY is not set, use mock data
+    if not os.getenv("OPENAI_API_KEY"):
+        logger.warning("Agent: code_review_agent - No OpenAI API key available, using mock data")
+        return {**mock_code_analysis(), **mock_review_comments()}
+
+    # The analysis and the comment come from one LLM call, so the diff is sent once
+    try:
+        logger.info("Agent: code_review_agent - Invoking AnalyzeAndCommentTool")
+        # The state is already typed, so the tool runs without re-validating its input.
+        # The review is streamed to clients of the graph's "custom" stream mode
+        writer = get_stream_writer()
+        result = await code_review_tool._arun(
+            state.pr_diff,
+            on_token=lambda token: writer({"node": "code_review", "token": token}),
+            repo=f"{state.repo_owner}/{state.repo_name}"
+        )
+        return result
+    except Exception as e:
+        logger.error(f"Agent: code_review_agent - Error reviewing code: {e}")
+        # Fallback to mock data on error
+        return {**mock_code_analysis(), **mock_review_comments()}
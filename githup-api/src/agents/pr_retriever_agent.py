@@ -1,47 +1,48 @@
+import asyncio
 import logging
-import re
-from typing import Dict, Any, Optional, Tuple
+import weakref
+from typing import Dict, Any, Tuple
+
+from cachetools import TTLCache
 
 from src.configs.schema import PRReviewState 
-from src.tools.github_tools import GetPRInfoTool, GetPRInfoInput
+from src.tools.github_tools import GetPRInfoTool
 
 logger = logging.getLogger(__name__)
 github_tool = GetPRInfoTool() 
 
-def parse_github_pr_url(url: str) -> Optional[Tuple[str, str, int]]:
+# Recently fetched PRs keyed by (repo_owner, repo_name, pr_number), so a
+# re-review shortly after skips the GitHub round-trips
+_pr_info_cache: TTLCache = TTLCache(maxsize=512, ttl=120)
+# One lock per PR being fetched, so concurrent requests for it fetch it once
+_pr_info_locks: "weakref.WeakValueDictionary[Tuple[str, str, int], asyncio.Lock]" = weakref.WeakValueDictionary()
+
+async def get_pr_info(repo_owner: str, repo_name: str, pr_number: int) -> Dict[str, Any]:
     """
-    Parses a GitHub PR URL to extract owner, repo, and PR number.
+    Returns the PR info from the cache, or fetches it with the GitHub tool.
     """
-    match = re.match(r"^(?:https?://)?github\.com/([^/]+)/([^/]+)/pull/(\d+)(?:/.*)?$", url)
-    if match:
-        owner, repo, pr_number_str = match.groups()
-        return owner, repo, int(pr_number_str)
-    return None
+    key = (repo_owner, repo_name, pr_number)
+    if key in _pr_info_cache:
+        logger.info(f"Agent: pr_retriever_agent - Using cached PR info for {repo_owner}/{repo_name}#{pr_number}")
+        return _pr_info_cache[key]
 
-def pr_retriever_agent(state: PRReviewState) -> Dict[str, Any]: # Return only the updated parts of the state
+    lock = _pr_info_locks.get(key)
+    if lock is None:
+        lock = _pr_info_locks[key] = asyncio.Lock()
+    async with lock:
+        if key not in _pr_info_cache:
+            _pr_info_cache[key] = await github_tool._arun(repo_owner, repo_name, pr_number)
+        return _pr_info_cache[key]
+
+async def pr_retriever_agent(state: PRReviewState) -> Dict[str, Any]: # Return only the updated parts of the state
     logger.info("Agent: pr_retriever_agent - Processing PR information")
     
-    # Check if we have a PR URL but no repo_owner/repo_name/pr_number
-    if 'pr_url' in state and (not state.get('repo_owner') or not state.get('repo_name') or not state.get('pr_number')):
-        logger.info(f"Agent: pr_retriever_agent - Parsing PR URL: {state['pr_url']}")
-        parsed_url = parse_github_pr_url(state['pr_url'])
-        if parsed_url:
-            repo_owner, repo_name, pr_number = parsed_url
-            logger.info(f"Agent: pr_retriever_agent - Parsed PR URL: Owner={repo_owner}, Repo={repo_name}, PR#={pr_number}")
-            state['repo_owner'] = repo_owner
-            state['repo_name'] = repo_name
-            state['pr_number'] = pr_number
-    
+    # The API parses the PR URL into repo_owner, repo_name and pr_number up front
     # Now retrieve the PR information using the GitHub tool
-    if state.get('repo_owner') and state.get('repo_name') and state.get('pr_number'):
-        logger.info(f"Agent: pr_retriever_agent - Retrieving PR info for {state['repo_owner']}/{state['repo_name']}#{state['pr_number']}")
-        tool_input = GetPRInfoInput(
-            repo_owner=state['repo_owner'],
-            repo_name=state['repo_name'],
-            pr_number=state['pr_number']
-        )
+    if state.repo_owner and state.repo_name and state.pr_number:
+        logger.info(f"Agent: pr_retriever_agent - Retrieving PR info for {state.repo_owner}/{state.repo_name}#{state.pr_number}")
         try:
-            result = github_tool(**tool_input.model_dump())
+            result = await get_pr_info(state.repo_owner, state.repo_name, state.pr_number)
             logger.info("Agent: pr_retriever_agent - Successfully retrieved PR information")
             return result
         except Exception as e:
@@ -1,44 +0,0 @@
-import logging
-import os
-from typing import Dict, Any
-
-from src.configs.schema import PRReviewState 
-from src.tools.openai_tools import GenerateCommentTool, GenerateCommentInput
-
-logger = logging.getLogger(__name__)
-comment_generator_tool = GenerateCommentTool() 
-
-def pr_review_comment_agent(state: PRReviewState) -> Dict[str, Any]:
-    logger.info("Agent: pr_review_comment_agent - Processing review comment generation")
-    
-    # Check if we have the necessary data to generate a review comment
-    if not state.get('code_summary') or not state.get('identified_risks'):
-        logger.warning("Agent: pr_review_comment_agent - Missing code summary or identified risks")
-        # For testing purposes, provide mock data
-        return {
-            "generated_review_comments": "Hello,\n\nThank you for addressing the crash issue related to formatting a backslash followed by a carriage return and a comment. Your update to the regular expression in the `list_comments` function to handle both `\\r\\n` and `\\r` is well-considered and should effectively resolve the problem.\n\n### Code Summary\nThe modification to the regex pattern in `list_comments` is a straightforward and efficient solution. By splitting on `\\r?\\n|\\r`, you ensure that all line endings are correctly handled, which is crucial for maintaining the robustness of the formatting logic. The addition of test cases specifically targeting carriage return edge cases is an excellent approach to verify the fix and prevent regression.\n\n### Identified Risks\nWhile no specific risks were identified, it's always good practice to ensure that changes to regex patterns are thoroughly tested across various scenarios. The new test cases you've added do a great job of covering these edge cases.\n\n### Suggestions\n1. **Test Coverage:** Consider adding a few more test cases with mixed line endings in a single string to further ensure robustness.\n2. **Documentation:** It might be helpful to document this change in the code comments or in a developer's guide, explaining why this regex pattern was chosen, to assist future maintainers.\n\nOverall, this update is a valuable improvement to the codebase. Thank you for your attention to detail and for enhancing the reliability of the formatting logic.\n\nBest regards,\n[Your Name]"
-        }
-    
-    # If OPENAI_API_KEY is not set, use mock data
-    if not os.getenv("OPENAI_API_KEY"):
-        logger.warning("Agent: pr_review_comment_agent - No OpenAI API key available, using mock data")
-        return {
-            "generated_review_comments": "Hello,\n\nThank you for addressing the crash issue related to formatting a backslash followed by a carriage return and a comment. Your update to the regular expression in the `list_comments` function to handle both `\\r\\n` and `\\r` is well-considered and should effectively resolve the problem.\n\n### Code Summary\nThe modification to the regex pattern in `list_comments` is a straightforward and efficient solution. By splitting on `\\r?\\n|\\r`, you ensure that all line endings are correctly handled, which is crucial for maintaining the robustness of the formatting logic. The addition of test cases specifically targeting carriage return edge cases is an excellent approach to verify the fix and prevent regression.\n\n### Identified Risks\nWhile no specific risks were identified, it's always good practice to ensure that changes to regex patterns are thoroughly tested across various scenarios. The new test cases you've added do a great job of covering these edge cases.\n\n### Suggestions\n1. **Test Coverage:** Consider adding a few more test cases with mixed line endings in a single string to further ensure robustness.\n2. **Documentation:** It might be helpful to document this change in the code comments or in a developer's guide, explaining why this regex pattern was chosen, to assist future maintainers.\n\nOverall, this update is a valuable improvement to the codebase. Thank you for your attention to detail and for enhancing the reliability of the formatting logic.\n\nBest regards,\n[Your Name]"
-        }
-    
-    # If we have all the necessary data and API key, use the real tool
-    try:
-        logger.info("Agent: pr_review_comment_agent - Invoking GenerateCommentTool")
-        tool_input = GenerateCommentInput(
-            code_summary=state['code_summary'],
-            identified_risks=state['identified_risks'],
-            pr_diff=state.get('pr_diff', '')
-        )
-        result = comment_generator_tool(**tool_input.model_dump())
-        return result
-    except Exception as e:
-        logger.error(f"Agent: pr_review_comment_agent - Error generating review comment: {e}")
-        # Fallback to mock data on error
-        return {
-            "generated_review_comments": "Hello,\n\nThank you for addressing the crash issue related to formatting a backslash followed by a carriage return and a comment. Your update to the regular expression in the `list_comments` function to handle both `\\r\\n` and `\\r` is well-considered and should effectively resolve the problem.\n\n### Code Summary\nThe modification to the regex pattern in `list_comments` is a straightforward and efficient solution. By splitting on `\\r?\\n|\\r`, you ensure that all line endings are correctly handled, which is crucial for maintaining the robustness of the formatting logic. The addition of test cases specifically targeting carriage return edge cases is an excellent approach to verify the fix and prevent regression.\n\n### Identified Risks\nWhile no specific risks were identified, it's always good practice to ensure that changes to regex patterns are thoroughly tested across various scenarios. The new test cases you've added do a great job of covering these edge cases.\n\n### Suggestions\n1. **Test Coverage:** Consider adding a few more test cases with mixed line endings in a single string to further ensure robustness.\n2. **Documentation:** It might be helpful to document this change in the code comments or in a developer's guide, explaining why this regex pattern was chosen, to assist future maintainers.\n\nOverall, this update is a valuable improvement to the codebase. Thank you for your attention to detail and for enhancing the reliability of the formatting logic.\n\nBest regards,\n[Your Name]"
-        }
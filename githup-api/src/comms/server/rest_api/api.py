@@ -1,17 +1,23 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import re
+import asyncio
+import json
 import logging
 import os
+from typing import Any, Dict, Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file at the earliest opportunity
 load_dotenv()
 
-from src.graph.graph import app 
+from src.graph.graph import app, app_ephemeral
+from src.agents.batch import BatchProcessor
+from src.agents.supervisor_agent import _SUPERVISOR_SINGLETON as supervisor
 from src.configs.schema import PRReviewState 
 from src.configs.config_loader import read_base_config
+from src.utils.github_url import parse_github_pr_url
 
 # --- Load Configuration ---
 config_data = read_base_config()
@@ -50,27 +56,37 @@ fast_api_app.add_middleware(
     allow_headers=config_data.get("allow_headers", ["*"]),
 )
 
+# Workflow runs in progress keyed by (thread_id, resumable); concurrent
+# requests for the same PR await the run already in progress instead of
+# starting another
+_inflight: dict[tuple[str, bool], asyncio.Task] = {}
+
+# Workflow runs allowed at once; each makes two OpenAI calls, so excess
+# requests wait here instead of running into the OpenAI rate limits
+_LLM_SEM = asyncio.Semaphore(config_data.get("max_parallel_reviews", 8))
+
 class PRReviewRequest(BaseModel):
     pr_url: str
+    # Checkpoint the run under its thread_id so it can be resumed later
+    resumable: bool = False
 
 class PRReviewResponse(BaseModel):
     pr_title: str
     pr_url: str
     review_summary: str 
 
-def parse_github_pr_url(url: str) -> tuple[str, str, int] | None:
-    """Parses a GitHub PR URL to extract owner, repo, and PR number."""
+class PRBatchReviewRequest(BaseModel):
+    pr_urls: list[str]
 
-    match = re.match(r"^(?:https?://)?github\.com/([^/]+)/([^/]+)/pull/(\d+)(?:/.*)?$", url)
-    if match:
-        owner, repo, pr_number_str = match.groups()
-        return owner, repo, int(pr_number_str)
-    return None
+class PRBatchReviewResponse(BaseModel):
+    batch_id: str
+    status: str
+    reviews: list[PRReviewResponse] = []
 
-@fast_api_app.post("/review-pr/", response_model=PRReviewResponse)
-async def review_pr_endpoint(request: PRReviewRequest):
-    logger.info(f"Received PR review request for URL: {request.pr_url}")
+batch_processor = BatchProcessor()
 
+def _initial_run_state(request: PRReviewRequest) -> tuple[PRReviewState, str]:
+    """Validates the request and builds the initial workflow state and its thread_id."""
     if not GITHUB_PAT or not OPENAI_API_KEY:
         # Check for GITHUB_PERSONAL_ACCESS_TOKEN here as well
         logger.error("API keys (GITHUB_PERSONAL_ACCESS_TOKEN or OPENAI_API_KEY) are missing in the environment.")
@@ -88,26 +104,48 @@ async def review_pr_endpoint(request: PRReviewRequest):
         repo_owner=repo_owner,
         repo_name=repo_name,
         pr_number=pr_number,
-        pr_title="", 
-        pr_url=request.pr_url,  # Pass the PR URL from the request
-        pr_diff="", 
-        pr_files_changed=[], 
-        pr_commit_messages=[],
-        code_summary="", 
-        identified_risks=[], 
-        generated_review_comments="", 
-        final_review_summary=""
+        pr_url=request.pr_url  # Pass the PR URL from the request; the other fields start empty
     )
 
     thread_id = f"pr-review-api-{repo_owner}-{repo_name}-{pr_number}"
+    return initial_run_state, thread_id
+
+@fast_api_app.post("/review-pr/", response_model=PRReviewResponse)
+async def review_pr_endpoint(request: PRReviewRequest):
+    logger.info(f"Received PR review request for URL: {request.pr_url}")
+    initial_run_state, thread_id = _initial_run_state(request)
+
+    key = (thread_id, request.resumable)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_run_workflow(request, initial_run_state, thread_id))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        logger.info(f"Joining the review already in progress for PR: {request.pr_url}")
+    # Shielded, so a client disconnecting does not cancel the run for the others
+    return await asyncio.shield(task)
+
+def _loggable_state(state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Returns the workflow state with its diff replaced by the diff's size, to keep the payload out of the logs."""
+    if not state or "pr_diff" not in state:
+        return state
+    return {**state, "pr_diff": f"<{len(state['pr_diff'].encode())} bytes>"}
+
+async def _run_workflow(request: PRReviewRequest, initial_run_state: PRReviewState, thread_id: str) -> PRReviewResponse:
+    """Runs the review workflow for one PR and builds the API response."""
     config = {"configurable": {"thread_id": thread_id}}
 
     try:
         logger.info(f"Invoking LangGraph app for PR: {request.pr_url} with thread_id: {thread_id}")
-        final_state = await app.ainvoke(initial_run_state, config=config)
+        async with _LLM_SEM:
+            if request.resumable:
+                final_state = await app.ainvoke(initial_run_state, config=config)
+            else:
+                final_state = await app_ephemeral.ainvoke(initial_run_state)
         logger.info(f"LangGraph app completed for PR: {request.pr_url}")
 
-        logger.info(f"Final state from workflow: {final_state}")
+        logger.info(f"Final state from workflow: {_loggable_state(final_state)}")
         
         # If we have PR title and URL, we can generate a response even if final_review_summary isn't available yet
         if final_state and 'pr_title' in final_state:
@@ -116,26 +154,7 @@ async def review_pr_endpoint(request: PRReviewRequest):
                 review_summary = final_state['final_review_summary']
             # Otherwise, try to generate it on the fly if we have the necessary components
             elif all(k in final_state for k in ['code_summary', 'identified_risks', 'generated_review_comments']):
-                title = final_state.get('pr_title', 'N/A')
-                url = final_state.get('pr_url', request.pr_url)
-                summary = final_state.get('code_summary', 'No summary.')
-                risks = final_state.get('identified_risks', [])
-                comments = final_state.get('generated_review_comments', 'No comments.')
-                risks_formatted = "\n".join([f"- {risk}" for risk in risks]) if risks else "- No specific risks highlighted."
-                
-                review_summary = f"""**Automated PR Review Summary**
-PR Title: {title}
-PR URL: {url}
-
-1. Summary of Changes:
-{summary}
-
-2. Identified Potential Risks/Concerns:
-{risks_formatted}
-
-3. Detailed Review Comments & Suggestions:
-{comments}
---- End of Automated Review ---""".strip()
+                review_summary = supervisor._generate_summary(PRReviewState(**final_state))
             else:
                 # If we don't have enough information, return what we have with an empty review summary
                 review_summary = ""
@@ -146,7 +165,7 @@ PR URL: {url}
                 review_summary=review_summary
             )
         else:
-            logger.error(f"Workflow completed for {request.pr_url}, but key information for response is missing in final_state: {final_state}")
+            logger.error(f"Workflow completed for {request.pr_url}, but key information for response is missing in final_state: {_loggable_state(final_state)}")
             raise HTTPException(status_code=500, detail="Workflow completed, but failed to generate full review summary.")
 
     except ValueError as ve: 
@@ -155,3 +174,70 @@ PR URL: {url}
     except Exception as e:
         logger.error(f"Unexpected error during workflow for {request.pr_url}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred during PR review: {e}")
+
+@fast_api_app.post("/review-pr/stream/")
+async def review_pr_stream_endpoint(request: PRReviewRequest):
+    """
+    Streams a PR review as server-sent events: an "update" event with the keys each
+    node set as it finishes, and "token" events with the review (as JSON) as the model
+    writes it. The final summary arrives in the last update.
+    """
+    logger.info(f"Received streaming PR review request for URL: {request.pr_url}")
+    initial_run_state, thread_id = _initial_run_state(request)
+    if request.resumable:
+        graph, config = app, {"configurable": {"thread_id": thread_id}}
+    else:
+        graph, config = app_ephemeral, None
+
+    async def events():
+        try:
+            async with _LLM_SEM:
+                async for mode, chunk in graph.astream(initial_run_state, config=config, stream_mode=["updates", "custom"]):
+                    if mode == "custom":
+                        yield f"event: token\ndata: {json.dumps(chunk)}\n\n"
+                        continue
+                    for node, update in chunk.items():
+                        # The client already has the PR URL and has no use for the raw diff
+                        update = {k: v for k, v in (update or {}).items() if k != "pr_diff"}
+                        yield f"event: update\ndata: {json.dumps({'node': node, 'update': update})}\n\n"
+        except Exception as e:
+            logger.error(f"Unexpected error during streamed workflow for {request.pr_url}: {e}", exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@fast_api_app.post("/review-prs/", response_model=PRBatchReviewResponse)
+async def review_prs_batch_endpoint(request: PRBatchReviewRequest):
+    """
+    Submits the reviews of many PRs as one OpenAI batch. Batches complete within
+    24 hours; poll GET /review-prs/{batch_id} for the reviews.
+    """
+    logger.info(f"Received batch PR review request for {len(request.pr_urls)} PRs")
+    if not GITHUB_PAT or not OPENAI_API_KEY:
+        logger.error("API keys (GITHUB_PERSONAL_ACCESS_TOKEN or OPENAI_API_KEY) are missing in the environment.")
+        raise HTTPException(status_code=500, detail="Server configuration error: Critical API keys missing.")
+
+    try:
+        submitted = await batch_processor.submit(request.pr_urls)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Unexpected error while submitting the batch review: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred while submitting the batch: {e}")
+    return PRBatchReviewResponse(batch_id=submitted["batch_id"], status=submitted["status"])
+
+@fast_api_app.get("/review-prs/{batch_id}", response_model=PRBatchReviewResponse)
+async def review_prs_batch_results_endpoint(batch_id: str):
+    """Returns the status of a batch review and, once completed, its reviews."""
+    try:
+        results = await batch_processor.results(batch_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown batch: {batch_id}")
+    except Exception as e:
+        logger.error(f"Unexpected error while retrieving batch {batch_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred while retrieving the batch: {e}")
+    return PRBatchReviewResponse(
+        batch_id=batch_id,
+        status=results["status"],
+        reviews=[PRReviewResponse(**review) for review in results["reviews"]]
+    )
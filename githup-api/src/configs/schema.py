@@ -1,17 +1,20 @@
-from typing import TypedDict, List, Optional
+from dataclasses import dataclass, field
+from typing import List, Optional
 
 # --- State Definition ---
-class PRReviewState(TypedDict):
+# Slotted, so the agents read fields as attributes rather than dict lookups
+@dataclass(slots=True)
+class PRReviewState:
     """Represents the state of the PR review workflow."""
-    repo_owner: str
-    repo_name: str
-    pr_number: Optional[int]
-    pr_title: str
-    pr_url: str
-    pr_diff: str
-    pr_files_changed: List[str]
-    pr_commit_messages: List[str]
-    code_summary: str
-    identified_risks: List[str]
-    generated_review_comments: str
-    final_review_summary: str
+    repo_owner: str = ""
+    repo_name: str = ""
+    pr_number: Optional[int] = None
+    pr_title: str = ""
+    pr_url: str = ""
+    pr_diff: str = ""
+    pr_files_changed: List[str] = field(default_factory=list)
+    pr_commit_messages: List[str] = field(default_factory=list)
+    code_summary: str = ""
+    identified_risks: List[str] = field(default_factory=list)
+    generated_review_comments: str = ""
+    final_review_summary: str = ""
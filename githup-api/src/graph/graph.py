@@ -8,38 +8,37 @@ from src.configs.schema import PRReviewState
 
 from src.agents import (
     pr_retriever_agent,
-    code_understanding_agent,
-    pr_review_comment_agent
+    code_review_agent
 )
-from src.agents.supervisor_agent import SupervisorAgent
+from src.agents.supervisor_agent import _SUPERVISOR_SINGLETON as supervisor
 
 logger = logging.getLogger(__name__)
 
 # --- Workflow Definition ---
 workflow = StateGraph(PRReviewState)
 
-# Create an instance of the SupervisorAgent that will coordinate all other agents
-supervisor = SupervisorAgent()
-
 # Add all agent nodes to the workflow
 workflow.add_node("supervisor", supervisor.coordinate)
 workflow.add_node("pr_retriever", pr_retriever_agent)
-workflow.add_node("code_analyzer", code_understanding_agent)
-workflow.add_node("comment_generator", pr_review_comment_agent)
+workflow.add_node("code_review", code_review_agent)
 workflow.add_node("final_summary", supervisor.compile_summary)
 
-# Define a simple sequential workflow for testing purposes
-# This ensures we get predictable results without complex conditional routing
+# Define a simple workflow without complex conditional routing; the code
+# analysis and the review comments come from a single LLM call on the PR diff
 workflow.add_edge("supervisor", "pr_retriever")
-workflow.add_edge("pr_retriever", "code_analyzer")
-workflow.add_edge("code_analyzer", "comment_generator")
-workflow.add_edge("comment_generator", "final_summary")
+workflow.add_edge("pr_retriever", "code_review")
+workflow.add_edge("code_review", "final_summary")
 workflow.add_edge("final_summary", END)
 
 # Set the supervisor as the entry point
 workflow.set_entry_point("supervisor")
 
-
+# Checkpointed runs keep every thread's state in memory for good, so only
+# requests that need to resume a run use this graph
 memory = MemorySaver()
 
-app = workflow.compile(checkpointer=memory) 
+app = workflow.compile(checkpointer=memory)
+
+# Runs without a checkpointer release their state as soon as they finish
+app_ephemeral = workflow.compile()
+
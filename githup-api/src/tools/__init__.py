@@ -1,11 +1,9 @@
 from .github_tools import GetPRInfoInput, GetPRInfoTool
-from .openai_tools import AnalyzeCodeInput, AnalyzeCodeTool, GenerateCommentInput, GenerateCommentTool
+from .openai_tools import AnalyzeAndCommentInput, AnalyzeAndCommentTool
 
 __all__ = [
     "GetPRInfoInput",
     "GetPRInfoTool",
-    "AnalyzeCodeInput",
-    "AnalyzeCodeTool",
-    "GenerateCommentInput",
-    "GenerateCommentTool",
+    "AnalyzeAndCommentInput",
+    "AnalyzeAndCommentTool",
 ]
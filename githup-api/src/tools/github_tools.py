@@ -1,16 +1,182 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
-from github import Github, GithubException
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import functools
+import httpx
+import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+import time
 import logging
 from dotenv import load_dotenv
 
+from src.utils.diff_cache import get_diff_cache
+from src.utils.diff_compact import compact_diff
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 GITHUB_TOKEN = os.environ.get("GITHUB_PERSONAL_ACCESS_TOKEN")
+GITHUB_API_URL = "https://api.github.com"
+# Media type of a PR's unified diff, used by the sync and async diff fetches alike
+DIFF_MEDIA_TYPE = "application/vnd.github.diff"
+# PRs fetched per GraphQL query, to keep each query well within GitHub's node limits
+GRAPHQL_BATCH_SIZE = 20
+
+# Transient errors are retried with exponential backoff (0.5s, 1s, 2s, ...)
+_RETRY_STATUSES = (429, 502, 503, 504)
+_MAX_RETRIES = 5
+_BACKOFF_FACTOR = 0.5
+# Longest wait for a rate limit reset before giving up instead
+_MAX_RATE_LIMIT_WAIT = 60
+
+def _retry() -> Retry:
+    return Retry(
+        total=_MAX_RETRIES, backoff_factor=_BACKOFF_FACTOR, status_forcelist=_RETRY_STATUSES,
+        respect_retry_after_header=True, raise_on_status=False
+    )
+
+def _rate_limit_wait(response: Any) -> Optional[float]:
+    """
+    Returns how long to wait before retrying a request GitHub rate limited (a 403 with
+    no requests remaining), or None if it was not rate limited or the reset is too far off.
+    """
+    if response.status_code != 403 or response.headers.get("X-RateLimit-Remaining") != "0":
+        return None
+    wait = int(response.headers.get("X-RateLimit-Reset", 0)) - time.time() + 1
+    return max(wait, 0) if wait <= _MAX_RATE_LIMIT_WAIT else None
+
+@functools.lru_cache(maxsize=1)
+def get_session() -> requests.Session:
+    """
+    Returns the requests session shared by the sync GitHub calls, created on first use,
+    so its pooled connections skip the TLS setup on later calls. Transient errors are
+    retried with backoff.
+    """
+    session = requests.Session()
+    session.headers["Authorization"] = f"token {GITHUB_TOKEN}"
+    session.headers["Accept"] = "application/vnd.github+json"
+    session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=_retry()))
+    return session
+
+def _session_get(url: str, **kwargs) -> requests.Response:
+    """Sends a GET request through the shared session, waiting out a near rate limit reset once."""
+    response = get_session().get(url, **kwargs)
+    wait = _rate_limit_wait(response)
+    if wait is not None:
+        logger.warning(f"GitHub rate limit reached, retrying in {wait:.0f}s")
+        time.sleep(wait)
+        response = get_session().get(url, **kwargs)
+    return response
+
+def _session_get_all_pages(url: str) -> List[Dict[str, Any]]:
+    """Fetches every page of a GitHub list endpoint through the shared session, following its "next" links."""
+    items: List[Dict[str, Any]] = []
+    params: Optional[Dict[str, Any]] = {"per_page": 100}
+    while url:
+        response = _session_get(url, params=params)
+        response.raise_for_status()
+        items.extend(response.json())
+        # The "next" link already carries the query parameters
+        url, params = response.links.get("next", {}).get("url"), None
+    return items
+
+@functools.lru_cache(maxsize=1)
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Returns the httpx client shared by the async GitHub calls, created on first use,
+    so concurrent reviews reuse its pooled keep-alive connections.
+    """
+    return httpx.AsyncClient(
+        base_url=GITHUB_API_URL,
+        headers={"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github+json"},
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        timeout=30
+    )
+
+# GitHub's secondary rate limits penalize bursts of concurrent requests,
+# so at most five are in flight at once
+_GITHUB_SEM = asyncio.Semaphore(5)
+
+async def _get(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    """
+    Sends a GET request to the GitHub API and raises on an error status. Transient
+    errors are retried with backoff (or after Retry-After), and a near rate limit
+    reset is waited out.
+    """
+    for attempt in range(_MAX_RETRIES + 1):
+        async with _GITHUB_SEM:
+            response = await client.get(url, **kwargs)
+        if attempt == _MAX_RETRIES:
+            break
+        if response.status_code in _RETRY_STATUSES:
+            try:
+                delay = float(response.headers["Retry-After"])
+            except (KeyError, ValueError):
+                delay = _BACKOFF_FACTOR * 2 ** attempt
+        else:
+            delay = _rate_limit_wait(response)
+            if delay is None:
+                break
+        logger.warning(f"GitHub returned {response.status_code} for {url}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+    # A 304 answers a conditional request, so it is not an error
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+async def _get_all_pages(client: httpx.AsyncClient, url: str) -> List[Dict[str, Any]]:
+    """
+    Fetches every page of a GitHub list endpoint. The first page tells how many
+    there are (its "last" link), and the remaining pages are fetched concurrently.
+    """
+    first_page = await _get(client, url, params={"per_page": 100})
+    items = first_page.json()
+    last_url = first_page.links.get("last", {}).get("url")
+    if last_url:
+        last_page = int(httpx.URL(last_url).params["page"])
+        pages = await asyncio.gather(*(
+            _get(client, url, params={"per_page": 100, "page": page}) for page in range(2, last_page + 1)
+        ))
+        for page in pages:
+            items.extend(page.json())
+    return items
+
+def _fetch_diff(pr_path: str) -> str:
+    """
+    Fetches the compacted diff of a PR through the shared session. A cached diff is
+    revalidated with its ETag, so an unchanged diff is not downloaded again (and the
+    304 does not count against the rate limit).
+    """
+    headers = {"Accept": DIFF_MEDIA_TYPE}
+    cached = get_diff_cache().get(pr_path)
+    if cached is not None:
+        headers["If-None-Match"] = cached[0]
+    response = _session_get(f"{GITHUB_API_URL}{pr_path}", headers=headers)
+    if response.status_code == 304:
+        return cached[1]
+    response.raise_for_status()
+    pr_diff = compact_diff(response.text)
+    if response.headers.get("ETag"):
+        get_diff_cache().set(pr_path, response.headers["ETag"], pr_diff)
+    return pr_diff
+
+async def _afetch_diff(client: httpx.AsyncClient, pr_path: str) -> str:
+    """Async version of _fetch_diff, using the given httpx client."""
+    headers = {"Accept": DIFF_MEDIA_TYPE}
+    cached = await asyncio.to_thread(get_diff_cache().get, pr_path)
+    if cached is not None:
+        headers["If-None-Match"] = cached[0]
+    response = await _get(client, pr_path, headers=headers)
+    if response.status_code == 304:
+        return cached[1]
+    pr_diff = compact_diff(response.text)
+    if response.headers.get("ETag"):
+        await asyncio.to_thread(get_diff_cache().set, pr_path, response.headers["ETag"], pr_diff)
+    return pr_diff
 
 class GetPRInfoInput(BaseModel):
     repo_owner: str = Field(description="Owner of the repository")
@@ -23,45 +189,216 @@ class GetPRInfoTool:
     args_schema: type[BaseModel] = GetPRInfoInput
 
     def __call__(self, repo_owner: str, repo_name: str, pr_number: Optional[int] = None) -> Dict[str, Any]:
+        """Validates the input against args_schema, then runs the tool."""
+        tool_input = self.args_schema(repo_owner=repo_owner, repo_name=repo_name, pr_number=pr_number)
+        return self._run(**tool_input.model_dump())
+
+    def _run(self, repo_owner: str, repo_name: str, pr_number: Optional[int] = None) -> Dict[str, Any]:
+        """Runs the tool on inputs that are already known to be valid."""
         if not GITHUB_TOKEN:
             logger.error(f"Tool '{self.name}': GITHUB_TOKEN is not set.")
             raise ValueError("GITHUB_TOKEN environment variable is not set.")
         
         logger.info(f"Tool '{self.name}': Fetching PR for {repo_owner}/{repo_name}, PR #: {pr_number or 'latest'}")
-        gh = Github(GITHUB_TOKEN)
+        repo_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}"
         try:
-            repo = gh.get_repo(f"{repo_owner}/{repo_name}")
             if pr_number is not None:
-                pr = repo.get_pull(pr_number)
+                pr_response = _session_get(f"{repo_url}/pulls/{pr_number}")
+                pr_response.raise_for_status()
+                pr = pr_response.json()
             else:
-                prs = repo.get_pulls(state='open', sort='created', direction='desc')
-                if prs.totalCount == 0:
+                pr_response = _session_get(
+                    f"{repo_url}/pulls",
+                    params={"state": "open", "sort": "created", "direction": "desc", "per_page": 1}
+                )
+                pr_response.raise_for_status()
+                prs = pr_response.json()
+                if not prs:
                     raise ValueError(f"No open PRs found in {repo_owner}/{repo_name}.")
                 pr = prs[0]
             
-            logger.info(f"Tool '{self.name}': Found PR #{pr.number}: {pr.title}")
+            logger.info(f"Tool '{self.name}': Found PR #{pr['number']}: {pr['title']}")
 
-            diff_response = requests.get(pr.diff_url, headers={"Authorization": f"token {GITHUB_TOKEN}"})
-            diff_response.raise_for_status()
-            pr_diff = diff_response.text
+            pr_path = f"/repos/{repo_owner}/{repo_name}/pulls/{pr['number']}"
+            pr_diff = _fetch_diff(pr_path)
 
-            files_changed = [file.filename for file in pr.get_files()]
-            commit_messages = [commit.commit.message for commit in pr.get_commits()]
+            pr_url = f"{GITHUB_API_URL}{pr_path}"
+            files_changed = [file["filename"] for file in _session_get_all_pages(f"{pr_url}/files")]
+            commit_messages = [commit["commit"]["message"] for commit in _session_get_all_pages(f"{pr_url}/commits")]
 
             return {
-                "pr_number": pr.number,
-                "pr_title": pr.title,
-                "pr_url": pr.html_url,
+                "pr_number": pr["number"],
+                "pr_title": pr["title"],
+                "pr_url": pr["html_url"],
                 "pr_diff": pr_diff,
                 "pr_files_changed": files_changed,
                 "pr_commit_messages": commit_messages,
             }
-        except GithubException as e:
-            logger.error(f"Tool '{self.name}': GitHub API Error: {e.status} - {e.data}")
+        except requests.HTTPError as e:
+            logger.error(f"Tool '{self.name}': GitHub API Error: {e.response.status_code} - {e.response.text}")
             raise
         except requests.RequestException as e:
-            logger.error(f"Tool '{self.name}': Error fetching diff: {e}")
+            logger.error(f"Tool '{self.name}': Error fetching PR: {e}")
+            raise
+        except ValueError as e: # Catch "No open PRs"
+            logger.error(f"Tool '{self.name}': {e}")
+            raise
+
+    async def acall(self, repo_owner: str, repo_name: str, pr_number: Optional[int] = None) -> Dict[str, Any]:
+        """Async version of __call__."""
+        tool_input = self.args_schema(repo_owner=repo_owner, repo_name=repo_name, pr_number=pr_number)
+        return await self._arun(**tool_input.model_dump())
+
+    async def _arun(self, repo_owner: str, repo_name: str, pr_number: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Async version of _run, using the shared httpx client. Once the PR is known,
+        its diff, files and commits are fetched concurrently.
+        """
+        if not GITHUB_TOKEN:
+            logger.error(f"Tool '{self.name}': GITHUB_TOKEN is not set.")
+            raise ValueError("GITHUB_TOKEN environment variable is not set.")
+
+        logger.info(f"Tool '{self.name}': Fetching PR for {repo_owner}/{repo_name}, PR #: {pr_number or 'latest'}")
+        client = get_async_client()
+        repo_path = f"/repos/{repo_owner}/{repo_name}"
+        try:
+            if pr_number is not None:
+                pr = (await _get(client, f"{repo_path}/pulls/{pr_number}")).json()
+            else:
+                prs = (await _get(
+                    client, f"{repo_path}/pulls",
+                    params={"state": "open", "sort": "created", "direction": "desc", "per_page": 1}
+                )).json()
+                if not prs:
+                    raise ValueError(f"No open PRs found in {repo_owner}/{repo_name}.")
+                pr = prs[0]
+
+            logger.info(f"Tool '{self.name}': Found PR #{pr['number']}: {pr['title']}")
+
+            pr_path = f"{repo_path}/pulls/{pr['number']}"
+            pr_diff, files, commits = await asyncio.gather(
+                _afetch_diff(client, pr_path),
+                _get_all_pages(client, f"{pr_path}/files"),
+                _get_all_pages(client, f"{pr_path}/commits"),
+            )
+
+            return {
+                "pr_number": pr["number"],
+                "pr_title": pr["title"],
+                "pr_url": pr["html_url"],
+                "pr_diff": pr_diff,
+                "pr_files_changed": [file["filename"] for file in files],
+                "pr_commit_messages": [commit["commit"]["message"] for commit in commits],
+            }
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Tool '{self.name}': GitHub API Error: {e.response.status_code} - {e.response.text}")
+            raise
+        except httpx.HTTPError as e:
+            logger.error(f"Tool '{self.name}': Error fetching PR: {e}")
             raise
         except ValueError as e: # Catch "No open PRs"
             logger.error(f"Tool '{self.name}': {e}")
             raise
+
+class BatchGetPRInfoInput(BaseModel):
+    pull_requests: List[GetPRInfoInput] = Field(description="The PRs to fetch; each needs a PR number")
+
+class BatchGetPRInfoTool:
+    name: str = "batch_get_pr_info_tool"
+    description: str = "Fetches the metadata of many GitHub Pull Requests at once, with one GraphQL query per batch of PRs."
+    args_schema: type[BaseModel] = BatchGetPRInfoInput
+
+    async def acall(self, pull_requests: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Validates the input against args_schema, then runs the tool."""
+        tool_input = self.args_schema(pull_requests=pull_requests)
+        return await self._arun([(pr.repo_owner, pr.repo_name, pr.pr_number) for pr in tool_input.pull_requests])
+
+    async def _arun(self, pull_requests: List[Tuple[str, str, int]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetches the title, files and commits of the PRs with GraphQL, GRAPHQL_BATCH_SIZE PRs
+        per query, then their diffs over REST, which GraphQL does not serve. Returns the PR
+        info keyed by "owner/repo#number"; PRs that do not exist are left out.
+        """
+        if not GITHUB_TOKEN:
+            logger.error(f"Tool '{self.name}': GITHUB_TOKEN is not set.")
+            raise ValueError("GITHUB_TOKEN environment variable is not set.")
+        if any(pr_number is None for _, _, pr_number in pull_requests):
+            raise ValueError("Every PR of a batch needs a PR number.")
+
+        logger.info(f"Tool '{self.name}': Fetching {len(pull_requests)} PRs")
+        client = get_async_client()
+        try:
+            batches = [pull_requests[i:i + GRAPHQL_BATCH_SIZE] for i in range(0, len(pull_requests), GRAPHQL_BATCH_SIZE)]
+            results = await asyncio.gather(*(self._fetch_batch(client, batch) for batch in batches))
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Tool '{self.name}': GitHub API Error: {e.response.status_code} - {e.response.text}")
+            raise
+        except httpx.HTTPError as e:
+            logger.error(f"Tool '{self.name}': Error fetching PRs: {e}")
+            raise
+        return {key: pr_info for result in results for key, pr_info in result.items()}
+
+    async def _fetch_batch(self, client: httpx.AsyncClient, pull_requests: List[Tuple[str, str, int]]) -> Dict[str, Dict[str, Any]]:
+        # One aliased repository field per repo, with one aliased pullRequest field per PR
+        repos: Dict[Tuple[str, str], List[int]] = {}
+        for repo_owner, repo_name, pr_number in pull_requests:
+            repos.setdefault((repo_owner, repo_name), []).append(pr_number)
+        fields = []
+        for repo_index, ((repo_owner, repo_name), pr_numbers) in enumerate(repos.items()):
+            prs = " ".join(
+                f"p{pr_number}: pullRequest(number: {pr_number}) {{ number title url "
+                f"files(first: 100) {{ nodes {{ path }} pageInfo {{ hasNextPage }} }} "
+                f"commits(first: 100) {{ nodes {{ commit {{ message }} }} pageInfo {{ hasNextPage }} }} }}"
+                for pr_number in pr_numbers
+            )
+            # JSON string literals are valid GraphQL string literals
+            fields.append(f"r{repo_index}: repository(owner: {json.dumps(repo_owner)}, name: {json.dumps(repo_name)}) {{ {prs} }}")
+
+        async with _GITHUB_SEM:
+            response = await client.post("/graphql", json={"query": f"query {{ {' '.join(fields)} }}"})
+        response.raise_for_status()
+        payload = response.json()
+        for error in payload.get("errors") or []:
+            logger.warning(f"Tool '{self.name}': GraphQL error: {error.get('message')}")
+        data = payload.get("data") or {}
+
+        found = []
+        for repo_index, ((repo_owner, repo_name), pr_numbers) in enumerate(repos.items()):
+            repo = data.get(f"r{repo_index}") or {}
+            for pr_number in pr_numbers:
+                pr = repo.get(f"p{pr_number}")
+                if pr is None:
+                    logger.warning(f"Tool '{self.name}': PR {repo_owner}/{repo_name}#{pr_number} not found")
+                    continue
+                found.append((repo_owner, repo_name, pr))
+
+        return dict(await asyncio.gather(*(self._complete_pr(client, *pr) for pr in found)))
+
+    async def _complete_pr(self, client: httpx.AsyncClient, repo_owner: str, repo_name: str,
+                           pr: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Fetches the diff of a PR, and its files or commits over REST when there are more than one page."""
+        pr_path = f"/repos/{repo_owner}/{repo_name}/pulls/{pr['number']}"
+
+        async def files() -> List[str]:
+            if not pr["files"]["pageInfo"]["hasNextPage"]:
+                return [file["path"] for file in pr["files"]["nodes"]]
+            return [file["filename"] for file in await _get_all_pages(client, f"{pr_path}/files")]
+
+        async def commits() -> List[str]:
+            if not pr["commits"]["pageInfo"]["hasNextPage"]:
+                return [node["commit"]["message"] for node in pr["commits"]["nodes"]]
+            return [commit["commit"]["message"] for commit in await _get_all_pages(client, f"{pr_path}/commits")]
+
+        pr_diff, files_changed, commit_messages = await asyncio.gather(
+            _afetch_diff(client, pr_path),
+            files(),
+            commits(),
+        )
+        return f"{repo_owner}/{repo_name}#{pr['number']}", {
+            "pr_number": pr["number"],
+            "pr_title": pr["title"],
+            "pr_url": pr["url"],
+            "pr_diff": pr_diff,
+            "pr_files_changed": files_changed,
+            "pr_commit_messages": commit_messages,
+        }
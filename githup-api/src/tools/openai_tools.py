@@ -1,120 +1,329 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import asyncio
+import functools
+import httpx
+import json
 import openai
 import os
 import logging
 
+from src.configs.config_loader import read_base_config
+from src.utils.llm_cache import LLMResponseCache, get_llm_cache
+from src.utils.semantic_cache import SEMANTIC_CACHE_THRESHOLD, get_semantic_cache
+
 logger = logging.getLogger(__name__)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-class AnalyzeCodeInput(BaseModel):
-    pr_diff: str = Field(description="The code diff to be analyzed.")
+@functools.lru_cache(maxsize=1)
+def get_client() -> openai.OpenAI:
+    """
+    Returns the OpenAI client shared by the sync tool calls, created on first use,
+    so its pooled connections are reused instead of set up on every call.
+    """
+    return openai.OpenAI(
+        api_key=OPENAI_API_KEY,
+        http_client=httpx.Client(
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=20),
+            timeout=60
+        )
+    )
 
-class AnalyzeCodeTool:
-    name: str = "analyze_code_tool"
-    description: str = "Analyzes a code diff using an LLM to summarize changes and identify potential risks."
-    args_schema: type[BaseModel] = AnalyzeCodeInput
+@functools.lru_cache(maxsize=1)
+def get_async_client() -> openai.AsyncOpenAI:
+    """
+    Returns the AsyncOpenAI client shared by all tools, created on first use.
+    Its pooled connections are kept alive across requests, so concurrent reviews
+    interleave their OpenAI calls instead of blocking the event loop.
+    """
+    return openai.AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            timeout=60
+        )
+    )
 
-    def __call__(self, pr_diff: str) -> Dict[str, Any]:
-        if not OPENAI_API_KEY:
-            logger.error(f"Tool '{self.name}': OPENAI_API_KEY is not set.")
-            raise ValueError("OPENAI_API_KEY environment variable is not set.")
+def select_model(pr_diff: str, default_model: str) -> str:
+    """
+    Picks the model for a diff: small diffs go to the cheaper, faster small model,
+    larger ones to the large model (the tool's own model unless configured).
+    """
+    routing = read_base_config().get("model_routing", {})
+    if len(pr_diff) < routing.get("small_diff_max_chars", 8000):
+        return routing.get("small_diff_model", "gpt-4o-mini")
+    return routing.get("large_diff_model", default_model)
 
-        logger.info(f"Tool '{self.name}': Analyzing PR diff.")
-        if not pr_diff:
-            logger.warning(f"Tool '{self.name}': No diff content to analyze.")
-            return {"code_summary": "No changes to analyze.", "identified_risks": []}
+# Embeds the diffs for the semantic cache; only the start of long diffs
+# is embedded, to stay within the model's input limit
+EMBEDDING_MODEL = "text-embedding-3-small"
+_EMBEDDING_MAX_CHARS = 16000
 
-        prompt = f"""You are an expert code review assistant.
-Analyze the following GitHub pull request diff. Provide:
-1. A concise summary of the changes (max 3-4 sentences).
-2. A list of potential risks, bugs, or poor coding practices observed. If none, state 'No specific risks identified'.
+async def aembed_diff(pr_diff: str) -> Optional[List[float]]:
+    """
+    Embeds a diff for semantic cache lookups. Returns None if the semantic cache is
+    disabled or the embedding fails, so the caller just skips the lookup.
+    """
+    if SEMANTIC_CACHE_THRESHOLD <= 0:
+        return None
+    try:
+        response = await get_async_client().embeddings.create(model=EMBEDDING_MODEL, input=pr_diff[:_EMBEDDING_MAX_CHARS])
+        return response.data[0].embedding
+    except openai.APIError as e:
+        logger.warning(f"Could not embed the diff for the semantic cache: {e}")
+        return None
 
-Format your response clearly, for example:
-Summary:
-[Your summary here]
+def _read_completion(response: Any, stream: bool, on_token: Optional[Callable[[str], None]] = None) -> Tuple[str, Optional[str]]:
+    """
+    Returns the text of a completion and its finish reason. A streamed one is read chunk
+    by chunk, and each piece of text is passed to on_token, if given, as it arrives.
+    """
+    if not stream:
+        return response.choices[0].message.content.strip(), response.choices[0].finish_reason
+    parts = []
+    finish_reason = None
+    for chunk in response:
+        if not chunk.choices:
+            continue
+        token = chunk.choices[0].delta.content
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        if token:
+            parts.append(token)
+            if on_token is not None:
+                on_token(token)
+    return "".join(parts).strip(), finish_reason
 
-Identified Risks:
-- [Risk 1]
-- [Risk 2]
+async def _aread_completion(response: Any, stream: bool, on_token: Optional[Callable[[str], None]] = None) -> Tuple[str, Optional[str]]:
+    """Async version of _read_completion."""
+    if not stream:
+        return response.choices[0].message.content.strip(), response.choices[0].finish_reason
+    parts = []
+    finish_reason = None
+    async for chunk in response:
+        if not chunk.choices:
+            continue
+        token = chunk.choices[0].delta.content
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        if token:
+            parts.append(token)
+            if on_token is not None:
+                on_token(token)
+    return "".join(parts).strip(), finish_reason
 
---- BEGIN DIFF ---
-{pr_diff}
---- END DIFF ---
-"""
+def _is_cacheable(completion: str, finish_reason: Optional[str], response_format: Optional[Dict[str, Any]]) -> bool:
+    """
+    Checks if a completion can be cached: the model finished it (it was not cut off at
+    max_tokens) and, if JSON was requested, it parses.
+    """
+    if finish_reason != "stop":
+        return False
+    if response_format:
         try:
-            client = openai.OpenAI(api_key=OPENAI_API_KEY)
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=800, temperature=0.3
-            )
-            analysis_text = response.choices[0].message.content.strip()
-
-            summary = "Could not parse summary."
-            risks = []
-            if "Summary:" in analysis_text and "Identified Risks:" in analysis_text:
-                summary_part = analysis_text.split("Summary:")[1].split("Identified Risks:")[0].strip()
-                risks_part = analysis_text.split("Identified Risks:")[1].strip()
-                summary = summary_part
-                if risks_part.lower() != 'no specific risks identified'.lower() and risks_part:
-                    risks = [r.strip().lstrip('- ') for r in risks_part.split('\n') if r.strip().lstrip('- ')]
-            else:
-                summary = analysis_text # Fallback
-            
-            logger.info(f"Tool '{self.name}': Analysis complete. Summary: {summary[:50]}... Risks: {len(risks)}")
-            return {"code_summary": summary, "identified_risks": risks}
-        except openai.APIError as e:
-            logger.error(f"Tool '{self.name}': OpenAI API Error: {e}")
-            return {"code_summary": f"Error analyzing code: {e}", "identified_risks": []}
-        except Exception as e:
-            logger.error(f"Tool '{self.name}': Unexpected error: {e}")
-            return {"code_summary": f"Unexpected error: {e}", "identified_risks": []}
+            json.loads(completion)
+        except json.JSONDecodeError:
+            return False
+    return True
+
+def _complete(messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float,
+              response_format: Optional[Dict[str, Any]] = None, stream: bool = True,
+              on_token: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Returns the completion of the messages, from the LLM response cache or else from the
+    model, caching it if it is complete. The completion is streamed unless stream is False, and its text
+    passed to on_token as it arrives (all at once when cached). OpenAI errors are raised.
+    """
+    cache_key = LLMResponseCache.key(model, messages, max_tokens, temperature, response_format)
+    cached = get_llm_cache().get(cache_key)
+    if cached is not None:
+        logger.info(f"Using a cached completion of {model}.")
+        if on_token is not None:
+            on_token(cached)
+        return cached
+
+    response = get_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens, temperature=temperature,
+        **({"response_format": response_format} if response_format else {}),
+        stream=stream
+    )
+    completion, finish_reason = _read_completion(response, stream, on_token)
+    if _is_cacheable(completion, finish_reason, response_format):
+        get_llm_cache().set(cache_key, completion)
+    return completion
+
+async def _acomplete(messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float,
+                     response_format: Optional[Dict[str, Any]] = None, stream: bool = True,
+                     on_token: Optional[Callable[[str], None]] = None,
+                     similar_to: Optional[str] = None, namespace: str = "") -> str:
+    """
+    Async version of _complete, using the shared AsyncOpenAI client. If similar_to is
+    given, a completion cached for a near-duplicate of it (a rebase, a cosmetic tweak)
+    in the namespace is reused as well.
+    """
+    cache_key = LLMResponseCache.key(model, messages, max_tokens, temperature, response_format)
+    # SQLite is blocking, so the caches are read and written in a worker thread
+    cached = await asyncio.to_thread(get_llm_cache().get, cache_key)
+    if cached is not None:
+        logger.info(f"Using a cached completion of {model}.")
+        if on_token is not None:
+            on_token(cached)
+        return cached
+
+    embedding = await aembed_diff(similar_to) if similar_to is not None else None
+    namespace = f"{namespace}:{model}"
+    if embedding is not None:
+        similar = await asyncio.to_thread(get_semantic_cache().lookup, namespace, embedding)
+        if similar is not None:
+            logger.info(f"Using the cached completion of {model} for a similar input.")
+            if on_token is not None:
+                on_token(similar)
+            return similar
+
+    response = await get_async_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens, temperature=temperature,
+        **({"response_format": response_format} if response_format else {}),
+        stream=stream
+    )
+    completion, finish_reason = await _aread_completion(response, stream, on_token)
+    if _is_cacheable(completion, finish_reason, response_format):
+        await asyncio.to_thread(get_llm_cache().set, cache_key, completion)
+        if embedding is not None:
+            await asyncio.to_thread(get_semantic_cache().store, namespace, embedding, completion)
+    return completion
+
+# Review comment of a PR without changes worth reviewing, given without calling the LLM
+NO_REVIEW_NEEDED = "No substantive changes detected; no review needed."
+
+# The diff is wrapped in these in the user message, joined rather than formatted
+_DIFF_HEADER = "--- BEGIN DIFF ---\n"
+_DIFF_FOOTER = "\n--- END DIFF ---"
+
+# Structured output: the model can only answer with JSON matching this schema
+REVIEW_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "code_review",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "summary": {"type": "string"},
+                "risks": {"type": "array", "items": {"type": "string"}},
+                "comment": {"type": "string"},
+            },
+            "required": ["summary", "risks", "comment"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# System prompt, kept apart from the diff so that every request starts with the same prefix
+ANALYZE_AND_COMMENT_INSTRUCTIONS = """You are an expert code review assistant.
+Review the GitHub pull request diff given by the user and answer with a JSON object with these keys:
+- "summary": a concise summary of the changes (max 3-4 sentences).
+- "risks": a list of potential risks, bugs, or poor coding practices observed, as strings. Empty if there are none.
+- "comment": a PR review comment that points out the risks or bugs with suggestions. It should be polite,
+  constructive, and read like a human reviewer: start with a polite opening, discuss the summary/risks
+  with suggestions, and conclude politely."""
+
+class AnalyzeAndCommentInput(BaseModel):
+    pr_diff: str = Field(description="The code diff to be reviewed.")
+
+class AnalyzeAndCommentTool:
+    name: str = "analyze_and_comment_tool"
+    description: str = "Analyzes a code diff and writes a PR review comment for it with a single LLM call."
+    args_schema: type[BaseModel] = AnalyzeAndCommentInput
+    model: str = "gpt-4o"
+    max_tokens: int = 1800
+    temperature: float = 0.3
+    response_format: Dict[str, Any] = REVIEW_RESPONSE_FORMAT
 
-class GenerateCommentInput(BaseModel):
-    code_summary: str = Field(description="Summary of the code changes.")
-    identified_risks: List[str] = Field(description="List of identified risks or concerns.")
-    pr_diff: str = Field(description="The full code diff for context.")
+    def __call__(self, pr_diff: str, stream: bool = True, on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Validates the input against args_schema, then runs the tool."""
+        return self._run(**self.args_schema(pr_diff=pr_diff).model_dump(), stream=stream, on_token=on_token)
 
-class GenerateCommentTool:
-    name: str = "generate_comment_tool"
-    description: str = "Generates a natural-language PR review comment based on code analysis."
-    args_schema: type[BaseModel] = GenerateCommentInput
+    async def acall(self, pr_diff: str, stream: bool = True, on_token: Optional[Callable[[str], None]] = None,
+                    repo: Optional[str] = None) -> Dict[str, Any]:
+        """Async version of __call__."""
+        return await self._arun(**self.args_schema(pr_diff=pr_diff).model_dump(), stream=stream, on_token=on_token, repo=repo)
 
-    def __call__(self, code_summary: str, identified_risks: List[str], pr_diff: str) -> Dict[str, str]:
+    def _run(self, pr_diff: str, stream: bool = True, on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Runs the tool on inputs that are already known to be valid. The completion is
+        streamed unless stream is False, and its text passed to on_token as it arrives.
+        """
         if not OPENAI_API_KEY:
             logger.error(f"Tool '{self.name}': OPENAI_API_KEY is not set.")
             raise ValueError("OPENAI_API_KEY environment variable is not set.")
-            
-        logger.info(f"Tool '{self.name}': Generating review comment.")
-        risks_text = "\n".join([f"- {risk}" for risk in identified_risks]) if identified_risks else "No specific risks were highlighted."
-        prompt = f"""You are an expert code review assistant. Generate a PR review comment.
-Based on:
-1. Code Summary: {code_summary}
-2. Identified Risks:
-{risks_text}
-3. Full Diff:
---- BEGIN DIFF ---
-{pr_diff}
---- END DIFF ---
-
-Comment should be polite, constructive, and act as a human reviewer.
-Format clearly. Start with a polite opening, discuss summary/risks with suggestions, and conclude politely.
-"""
+
+        logger.info(f"Tool '{self.name}': Reviewing PR diff.")
+        if not pr_diff.strip():
+            logger.warning(f"Tool '{self.name}': No diff content to review.")
+            return {"code_summary": "No changes to analyze.", "identified_risks": [], "generated_review_comments": NO_REVIEW_NEEDED}
+
+        try:
+            review_text = _complete(
+                self.build_messages(pr_diff), select_model(pr_diff, self.model),
+                self.max_tokens, self.temperature, self.response_format,
+                stream=stream, on_token=on_token
+            )
+        except Exception as e:
+            return self.error_response(e)
+        return self.parse_response(review_text)
+
+    async def _arun(self, pr_diff: str, stream: bool = True, on_token: Optional[Callable[[str], None]] = None,
+                    repo: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async version of _run. Given the PR's repository ("owner/name"), it also reuses
+        the review of a near-duplicate diff of the same repository.
+        """
+        if not OPENAI_API_KEY:
+            logger.error(f"Tool '{self.name}': OPENAI_API_KEY is not set.")
+            raise ValueError("OPENAI_API_KEY environment variable is not set.")
+
+        logger.info(f"Tool '{self.name}': Reviewing PR diff.")
+        if not pr_diff.strip():
+            logger.warning(f"Tool '{self.name}': No diff content to review.")
+            return {"code_summary": "No changes to analyze.", "identified_risks": [], "generated_review_comments": NO_REVIEW_NEEDED}
+
         try:
-            client = openai.OpenAI(api_key=OPENAI_API_KEY)
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=1000, temperature=0.5
+            review_text = await _acomplete(
+                self.build_messages(pr_diff), select_model(pr_diff, self.model),
+                self.max_tokens, self.temperature, self.response_format,
+                stream=stream, on_token=on_token,
+                similar_to=pr_diff if repo else None, namespace=f"{self.name}:{repo}"
             )
-            review_comment = response.choices[0].message.content.strip()
-            logger.info(f"Tool '{self.name}': Comment generated (preview: {review_comment[:50]}...).")
-            return {"generated_review_comments": review_comment}
-        except openai.APIError as e:
-            logger.error(f"Tool '{self.name}': OpenAI API Error: {e}")
-            return {"generated_review_comments": f"Error generating comment: {e}"}
         except Exception as e:
-            logger.error(f"Tool '{self.name}': Unexpected error: {e}")
-            return {"generated_review_comments": f"Unexpected error: {e}"}
+            return self.error_response(e)
+        return self.parse_response(review_text)
+
+    def build_messages(self, pr_diff: str) -> List[Dict[str, str]]:
+        # The static instructions come first, so OpenAI can reuse the cached prefix across PRs
+        return [
+            {"role": "system", "content": ANALYZE_AND_COMMENT_INSTRUCTIONS},
+            {"role": "user", "content": "".join((_DIFF_HEADER, pr_diff, _DIFF_FOOTER))},
+        ]
+
+    def error_response(self, error: Exception) -> Dict[str, Any]:
+        if isinstance(error, openai.APIError):
+            logger.error(f"Tool '{self.name}': OpenAI API Error: {error}")
+            return {"code_summary": f"Error analyzing code: {error}", "identified_risks": [], "generated_review_comments": f"Error generating comment: {error}"}
+        logger.error(f"Tool '{self.name}': Unexpected error: {error}")
+        return {"code_summary": f"Unexpected error: {error}", "identified_risks": [], "generated_review_comments": f"Unexpected error: {error}"}
+
+    def parse_response(self, review_text: str) -> Dict[str, Any]:
+        try:
+            review = json.loads(review_text)
+        except json.JSONDecodeError:
+            logger.warning(f"Tool '{self.name}': Response is not valid JSON, using it as the comment.")
+            return {"code_summary": "Could not parse summary.", "identified_risks": [], "generated_review_comments": review_text}
+
+        summary = review.get("summary") or "Could not parse summary."
+        risks = [str(risk) for risk in review.get("risks") or []]
+        comment = review.get("comment") or ""
+        logger.info(f"Tool '{self.name}': Review complete. Summary: {summary[:50]}... Risks: {len(risks)}")
+        return {"code_summary": summary, "identified_risks": risks, "generated_review_comments": comment}
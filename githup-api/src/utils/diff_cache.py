@@ -0,0 +1,49 @@
+import functools
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from src.utils.llm_cache import CACHE_DIR, CACHE_TTL
+
+
+class DiffCache:
+    """
+    SQLite-backed cache of PR diffs and their ETags, keyed by the PR's API path, so an
+    unchanged diff can be revalidated with If-None-Match instead of downloaded again.
+    """
+
+    def __init__(self, path: Path = CACHE_DIR / "llm_cache.sqlite3", ttl: int = CACHE_TTL):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        # The connection is shared by the worker threads of the async tools
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pr_diffs "
+            "(pr_path TEXT PRIMARY KEY, etag TEXT NOT NULL, diff TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, pr_path: str) -> Optional[Tuple[str, str]]:
+        """Returns the (ETag, diff) pair cached for the PR, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, diff FROM pr_diffs WHERE pr_path = ? AND expires_at > ?", (pr_path, time.time())
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, pr_path: str, etag: str, diff: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pr_diffs VALUES (?, ?, ?, ?)", (pr_path, etag, diff, time.time() + self.ttl)
+            )
+
+
+@functools.lru_cache(maxsize=1)
+def get_diff_cache() -> DiffCache:
+    """
+    Returns the diff cache shared by the GitHub tools, opened on first use.
+    """
+    return DiffCache()
@@ -0,0 +1,147 @@
+import re
+from typing import List, Tuple
+
+# Upper bound of the diff sent to the LLMs and kept in the workflow state
+MAX_DIFF_BYTES = 32768
+
+# Appended when hunks had to be left out to fit the size limit
+_OMITTED_NOTE = "\n... {omitted} more hunks omitted to fit the size limit ...\n"
+# Ends a hunk that was cut short to fit the size limit
+_TRUNCATED_NOTE = "... hunk truncated to fit the size limit ...\n"
+
+# Lockfiles, minified and generated files, whose changes are not worth reviewing
+_SKIPPED_FILE_RE = re.compile(
+    r"(^|/)(package-lock\.json|yarn\.lock|pnpm-lock\.yaml|poetry\.lock|Pipfile\.lock|Cargo\.lock|go\.sum)$"
+    r"|\.min\.(js|css)$"
+    r"|\.generated\."
+)
+
+
+def _split_files(diff: str) -> List[Tuple[str, List[str]]]:
+    """
+    Splits a unified diff into (file header, hunks) pairs. The header holds the
+    lines before the first "@@" of the file; each hunk starts at its "@@" line.
+    """
+    files: List[Tuple[str, List[str]]] = []
+    header: List[str] = []
+    hunks: List[str] = []
+    hunk: List[str] = []
+
+    def flush_hunk():
+        if hunk:
+            hunks.append("".join(hunk))
+            hunk.clear()
+
+    for line in diff.splitlines(keepends=True):
+        if line.startswith("diff --git "):
+            flush_hunk()
+            if header or hunks:
+                files.append(("".join(header), hunks))
+            header, hunks = [line], []
+        elif line.startswith("@@"):
+            flush_hunk()
+            hunk.append(line)
+        elif hunk:
+            hunk.append(line)
+        else:
+            header.append(line)
+    flush_hunk()
+    if header or hunks:
+        files.append(("".join(header), hunks))
+    return files
+
+
+def _normalize_line(line: str) -> str:
+    """
+    Collapses the whitespace inside a diff line (after its +/- marker), keeping its
+    indentation, which is significant in Python or YAML.
+    """
+    content = line[1:]
+    indent = content[:len(content) - len(content.lstrip())]
+    return indent + " ".join(content.split())
+
+
+def _is_whitespace_only(hunk: str) -> bool:
+    """
+    Checks if a hunk only changes whitespace inside lines: its removed and added
+    lines are the same, line by line, once the whitespace inside them is collapsed.
+    A change of indentation is a real change.
+    """
+    removed, added = [], []
+    for line in hunk.splitlines()[1:]:
+        if line.startswith("-"):
+            removed.append(_normalize_line(line))
+        elif line.startswith("+"):
+            added.append(_normalize_line(line))
+    return removed == added
+
+
+def _truncate_hunk(hunk: str, max_bytes: int) -> str:
+    """
+    Keeps the first lines of a hunk that fit in max_bytes along with a truncation note,
+    or returns an empty string if not even its "@@" line fits.
+    """
+    room = max_bytes - len(_TRUNCATED_NOTE.encode())
+    kept = []
+    for line in hunk.splitlines(keepends=True):
+        room -= len(line.encode())
+        if room < 0:
+            break
+        kept.append(line)
+    return "".join(kept) + _TRUNCATED_NOTE if kept else ""
+
+
+def compact_diff(diff: str, max_bytes: int = MAX_DIFF_BYTES) -> str:
+    """
+    Drops the hunks of lockfiles and generated files and the hunks that only change
+    whitespace inside lines (keeping the file headers, so the change is still visible) and,
+    if it is still larger than max_bytes, keeps the hunks of all files round-robin until the limit is
+    reached, so every file is represented rather than only the first ones. The headers of all
+    files are kept, and a first hunk too large for the room left is truncated rather than dropped.
+    """
+    files = []
+    for header, hunks in _split_files(diff):
+        path = header.split("\n", 1)[0].rpartition(" b/")[2]
+        if _SKIPPED_FILE_RE.search(path):
+            files.append((header, []))
+            continue
+        # A file whose hunks only changed whitespace keeps its header, so the change is still visible
+        files.append((header, [hunk for hunk in hunks if not _is_whitespace_only(hunk)]))
+
+    compacted = "".join(header + "".join(hunks) for header, hunks in files)
+    if len(compacted.encode()) <= max_bytes:
+        return compacted
+
+    total_hunks = sum(len(hunks) for _, hunks in files)
+    # Room is kept for the note, with the largest count it can hold
+    budget = max_bytes - len(_OMITTED_NOTE.format(omitted=total_hunks).encode())
+
+    # Every file keeps its header, even with no hunks kept, so all changed files are listed
+    shown = []
+    size = 0
+    omitted = 0
+    for header, hunks in files:
+        if size + len(header.encode()) > budget:
+            omitted += len(hunks)
+            continue
+        shown.append((header, hunks))
+        size += len(header.encode())
+
+    # A first hunk that does not fit is truncated to its file's share of the room left
+    share = (budget - size) // max(sum(1 for _, hunks in shown if hunks), 1)
+    kept = [[] for _ in shown]
+    for i in range(max((len(hunks) for _, hunks in shown), default=0)):
+        for file_index, (_, hunks) in enumerate(shown):
+            if i >= len(hunks):
+                continue
+            hunk = hunks[i]
+            if size + len(hunk.encode()) > budget:
+                hunk = _truncate_hunk(hunk, min(share, budget - size)) if i == 0 else ""
+                if not hunk:
+                    omitted += 1
+                    continue
+            kept[file_index].append(hunk)
+            size += len(hunk.encode())
+
+    sampled = "".join(header + "".join(hunks) for (header, _), hunks in zip(shown, kept))
+    return sampled + _OMITTED_NOTE.format(omitted=omitted) if omitted else sampled
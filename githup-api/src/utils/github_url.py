@@ -0,0 +1,12 @@
+import re
+from typing import Optional, Tuple
+
+# Compiled once; shared by the API endpoint and the agents
+_PR_URL_RE = re.compile(r"^(?:https?://)?github\.com/([^/]+)/([^/]+)/pull/(\d+)(?:/.*)?$")
+
+def parse_github_pr_url(url: str) -> Optional[Tuple[str, str, int]]:
+    """
+    Parses a GitHub PR URL to extract owner, repo, and PR number.
+    """
+    match = _PR_URL_RE.match(url)
+    return (match[1], match[2], int(match[3])) if match else None
@@ -0,0 +1,59 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CACHE_DIR = Path(os.getenv("PR_CACHE_DIR", "~/.cache/pr_reviewer")).expanduser()
+# Seconds a cached completion stays valid; 7 days by default
+CACHE_TTL = int(os.getenv("PR_CACHE_TTL", 7 * 24 * 3600))
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of LLM completions, keyed by the SHA-256 of the model, messages and
+    sampling parameters. The messages hold the diff, so a PR with new commits gets a new key.
+    """
+
+    def __init__(self, path: Path = CACHE_DIR / "llm_cache.sqlite3", ttl: int = CACHE_TTL):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        # The connection is shared by the worker threads of the async tools
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def key(model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+            response_format: Optional[Dict[str, Any]] = None) -> str:
+        """Returns the key of a completion: the request parameters that change its output."""
+        request = [model, messages, max_tokens, temperature, response_format]
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM completions WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?)", (key, value, time.time() + self.ttl)
+            )
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Returns the LLM response cache shared by all tools, opened on first use.
+    """
+    return LLMResponseCache()
@@ -0,0 +1,110 @@
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.llm_cache import CACHE_DIR, CACHE_TTL
+
+# Minimum cosine similarity of two diffs for a semantic cache hit, e.g. 0.98; 0 (the
+# default) disables the cache, which costs an embedding call on every exact cache miss
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0"))
+# Entries kept per namespace; each lookup compares the diff with all of them
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))
+
+
+def _normalize(embedding: List[float]) -> array:
+    """Scales an embedding to unit length, so a dot product is its cosine similarity."""
+    norm = math.sqrt(sum(x * x for x in embedding)) or 1.0
+    return array("f", (x / norm for x in embedding))
+
+
+class SemanticCache:
+    """
+    Cache of LLM completions for near-duplicate diffs (rebases, cosmetic tweaks): it returns
+    the completion whose diff embedding is the most similar, if at least threshold.
+    Entries are kept in the same SQLite file as the exact LLM response cache and the live
+    ones loaded into memory when the cache is opened. Each namespace keeps at most
+    max_entries, dropping the oldest.
+    """
+
+    def __init__(self, path: Path = CACHE_DIR / "llm_cache.sqlite3", threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl: int = CACHE_TTL, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # The connection is shared by the worker threads of the async tools
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_completions "
+            "(namespace TEXT NOT NULL, embedding BLOB NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        # (rowid, unit embedding, completion, expires_at) of the live entries of each namespace, oldest first
+        self._index: Dict[str, List[Tuple[int, array, str, float]]] = {}
+        with self._conn:
+            self._conn.execute("DELETE FROM semantic_completions WHERE expires_at <= ?", (time.time(),))
+        for rowid, namespace, blob, value, expires_at in self._conn.execute(
+            "SELECT rowid, namespace, embedding, value, expires_at FROM semantic_completions ORDER BY expires_at"
+        ):
+            embedding = array("f")
+            embedding.frombytes(blob)
+            self._index.setdefault(namespace, []).append((rowid, embedding, value, expires_at))
+        with self._lock, self._conn:
+            for namespace in list(self._index):
+                self._evict(namespace, time.time())
+
+    def _evict(self, namespace: str, now: float) -> None:
+        """Drops the expired entries of a namespace and its oldest ones past max_entries; the lock must be held."""
+        entries = self._index.get(namespace, [])
+        live = [entry for entry in entries if entry[3] > now]
+        dropped = [entry for entry in entries if entry[3] <= now]
+        if len(live) > self.max_entries:
+            dropped += live[:len(live) - self.max_entries]
+            live = live[len(live) - self.max_entries:]
+        if dropped:
+            self._conn.executemany("DELETE FROM semantic_completions WHERE rowid = ?", [(entry[0],) for entry in dropped])
+        self._index[namespace] = live
+
+    def lookup(self, namespace: str, embedding: List[float]) -> Optional[str]:
+        """
+        Returns the completion of the most similar entry of the namespace (the tool, repository and model),
+        or None if no entry is at least threshold similar.
+        """
+        query = _normalize(embedding)
+        now = time.time()
+        best_value, best_similarity = None, self.threshold
+        with self._lock:
+            entries = list(self._index.get(namespace, ()))
+        for _, entry_embedding, value, expires_at in entries:
+            if expires_at <= now:
+                continue
+            similarity = sum(a * b for a, b in zip(query, entry_embedding))
+            if similarity >= best_similarity:
+                best_value, best_similarity = value, similarity
+        return best_value
+
+    def store(self, namespace: str, embedding: List[float], value: str) -> None:
+        unit = _normalize(embedding)
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO semantic_completions VALUES (?, ?, ?, ?)", (namespace, unit.tobytes(), value, expires_at)
+            )
+            self._index.setdefault(namespace, []).append((cursor.lastrowid, unit, value, expires_at))
+            self._evict(namespace, now)
+
+
+@functools.lru_cache(maxsize=1)
+def get_semantic_cache() -> SemanticCache:
+    """
+    Returns the semantic cache shared by all tools, opened on first use.
+    """
+    return SemanticCache()
@@ -1,11 +1,21 @@
-import requests
+import functools
 import json
 
+import requests
+from requests.adapters import HTTPAdapter
+
 API_URL = "http://127.0.0.1:8000/review-pr/"
 
 
 TEST_PR_URL = "https://github.com/psf/black/pull/4663" 
 
+@functools.lru_cache(maxsize=1)
+def _session() -> requests.Session:
+    """Returns the session shared by the test requests, so they reuse its keep-alive connections."""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=10))
+    return session
+
 def test_pr_review_api(pr_url: str):
     """Sends a request to the PR review API and prints the response."""
     payload = {"pr_url": pr_url}
@@ -14,7 +24,7 @@ def test_pr_review_api(pr_url: str):
     print(f"Payload: {json.dumps(payload)}\n")
     
     try:
-        response = requests.post(API_URL, json=payload, timeout=300) 
+        response = _session().post(API_URL, json=payload, timeout=300) 
         
         print(f"Response Status Code: {response.status_code}\n")
         